@@ -1,5 +1,20 @@
 from neo4j import GraphDatabase
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import shutil
+import sqlite3
+import time
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from GraphRetrievalLayer.schema import (bootstrap_schema, backfill_search_keys, bump_kg_version, search_key,
+                                        EMBEDDING_DIMENSIONS, EMBEDDING_STORAGE)
 
 with open("config.txt") as f:
     lines = [line.strip() for line in f if line.strip() and "=" in line]
@@ -9,7 +24,10 @@ with open("config.txt") as f:
 
 driver = GraphDatabase.driver(URI, auth=(USERNAME, PASSWORD))
 
-df = pd.read_csv("fpl_two_seasons.csv")
+CSV_PATH = "fpl_two_seasons.csv"
+MANIFEST_PATH = "kg_manifest.sqlite"
+EXPORT_DIR = "import"
+SNAPSHOT_DIR = "snapshot"
 
 query = """
 UNWIND $rows AS row
@@ -20,13 +38,19 @@ SET f.kickoff_time = row.kickoff_time
 MERGE (ht:Team { name: row.home_team})
 MERGE (at:Team { name: row.away_team})
 MERGE (pl:Player { player_name: row.name, player_element: row.element})
-MERGE (po:Position { name: row.position}) 
+MERGE (po:Position { name: row.position})
+MERGE (pt:Team { name: row.player_team})
+SET ht.search_name = row.home_team_key,
+    at.search_name = row.away_team_key,
+    pt.search_name = row.player_team_key,
+    pl.search_name = row.name_key
 
 MERGE (s) -[:HAS_GW]->(gw)
 MERGE (gw) -[:HAS_FIXTURE]->(f)
 MERGE (f) -[:HAS_HOME_TEAM]->(ht)
 MERGE (f) -[:HAS_AWAY_TEAM]->(at)
 MERGE (pl) -[:PLAYS_AS]->(po)
+MERGE (pl) -[:PLAYS_FOR { season: row.season}]->(pt)
 MERGE (pl) -[r:PLAYED_IN]-> (f)
 SET r.minutes = toInteger(row.minutes),
     r.goals_scored = toInteger(row.goals_scored),
@@ -48,30 +72,924 @@ SET r.minutes = toInteger(row.minutes),
     r.ict_index = toFloat(row.ict_index),
     r.form = toFloat(row.form)
 """
-batch_size = 1000
-total_rows = len(df)
 
-with driver.session() as session:
-    session.run("MATCH (n) DETACH DELETE n")
 
-with driver.session() as session:
-    for i in range(0, total_rows, batch_size):
-        batch = df.iloc[i:i+batch_size].to_dict('records')
-        session.run(query, rows=batch)
-        print(f"Processed rows {i} to {min(i+batch_size, total_rows)}")
+#--------------------------------------------
+# Phased loader: distinct nodes first, then PLAYED_IN in parallel
+#--------------------------------------------
+# Every node query returns the row key together with the new node's elementId,
+# so the relationship phase can seek nodes by id instead of scanning labels.
+
+SEASON_NODES = """
+UNWIND $rows AS row
+CREATE (s:Season { season_name: row.season })
+RETURN row.key AS key, elementId(s) AS id
+"""
+
+TEAM_NODES = """
+UNWIND $rows AS row
+CREATE (t:Team { name: row.name, search_name: row.search_name })
+RETURN row.key AS key, elementId(t) AS id
+"""
+
+POSITION_NODES = """
+UNWIND $rows AS row
+CREATE (po:Position { name: row.name })
+RETURN row.key AS key, elementId(po) AS id
+"""
+
+GAMEWEEK_NODES = """
+UNWIND $rows AS row
+MATCH (s) WHERE elementId(s) = row.season_id
+CREATE (s)-[:HAS_GW]->(gw:Gameweek { season: row.season, GW_number: toInteger(row.GW) })
+RETURN row.key AS key, elementId(gw) AS id
+"""
+
+FIXTURE_NODES = """
+UNWIND $rows AS row
+MATCH (gw) WHERE elementId(gw) = row.gw_id
+MATCH (ht) WHERE elementId(ht) = row.home_id
+MATCH (at) WHERE elementId(at) = row.away_id
+CREATE (gw)-[:HAS_FIXTURE]->(f:Fixture { season: row.season, fixture_number: toInteger(row.fixture) })
+SET f.kickoff_time = row.kickoff_time
+CREATE (f)-[:HAS_HOME_TEAM]->(ht)
+CREATE (f)-[:HAS_AWAY_TEAM]->(at)
+RETURN row.key AS key, elementId(f) AS id
+"""
+
+PLAYER_NODES = """
+UNWIND $rows AS row
+CREATE (pl:Player { player_name: row.name, player_element: row.element, search_name: row.search_name })
+RETURN row.key AS key, elementId(pl) AS id
+"""
+
+PLAYS_AS_EDGES = """
+UNWIND $rows AS row
+MATCH (pl) WHERE elementId(pl) = row.player_id
+MATCH (po) WHERE elementId(po) = row.position_id
+CREATE (pl)-[:PLAYS_AS]->(po)
+"""
+
+PLAYS_FOR_EDGES = """
+UNWIND $rows AS row
+MATCH (pl) WHERE elementId(pl) = row.player_id
+MATCH (t) WHERE elementId(t) = row.team_id
+CREATE (pl)-[:PLAYS_FOR { season: row.season }]->(t)
+"""
+
+PLAYED_IN_EDGES = """
+UNWIND $rows AS row
+MATCH (pl) WHERE elementId(pl) = row.player_id
+MATCH (f) WHERE elementId(f) = row.fixture_id
+CREATE (pl)-[r:PLAYED_IN]->(f)
+SET r.minutes = toInteger(row.minutes),
+    r.goals_scored = toInteger(row.goals_scored),
+    r.assists = toInteger(row.assists),
+    r.total_points = toInteger(row.total_points),
+    r.bonus = toInteger(row.bonus),
+    r.clean_sheets = toInteger(row.clean_sheets),
+    r.goals_conceded = toInteger(row.goals_conceded),
+    r.own_goals = toInteger(row.own_goals),
+    r.penalties_saved = toInteger(row.penalties_saved),
+    r.penalties_missed = toInteger(row.penalties_missed),
+    r.yellow_cards = toInteger(row.yellow_cards),
+    r.red_cards = toInteger(row.red_cards),
+    r.saves = toInteger(row.saves),
+    r.bps = toInteger(row.bps),
+    r.influence = toFloat(row.influence),
+    r.creativity = toFloat(row.creativity),
+    r.threat = toFloat(row.threat),
+    r.ict_index = toFloat(row.ict_index),
+    r.form = toFloat(row.form)
+"""
+
+
+#--------------------------------------------
+# Streaming CSV reader
+#--------------------------------------------
+def player_team(row):
+    """
+    The player's own team for this row: the `team` column when present,
+    otherwise the home or away team depending on `was_home`.
+    """
+    team = row.get("team")
+    if isinstance(team, str) and team:
+        return team
+    return row["home_team"] if str(row.get("was_home")).lower() == "true" else row["away_team"]
+
+
+def iter_row_batches(csv_path, batch_size):
+    """
+    Yields the CSV as lists of row dicts, `batch_size` rows at a time.
+    Only one chunk is held in memory, whatever the size of the file.
+    """
+    for chunk in pd.read_csv(csv_path, chunksize=batch_size):
+        rows = chunk.to_dict('records')
+        for row in rows:
+            row["name_key"] = search_key(row["name"])
+            row["home_team_key"] = search_key(row["home_team"])
+            row["away_team_key"] = search_key(row["away_team"])
+            row["player_team"] = player_team(row)
+            row["player_team_key"] = search_key(row["player_team"])
+        yield rows
+
+
+def batches(rows, batch_size):
+    for i in range(0, len(rows), batch_size):
+        yield rows[i:i + batch_size]
+
+
+def create_nodes(session, cypher, rows, batch_size):
+    """
+    Creates nodes in batches and returns {row key: elementId}.
+    """
+    ids = {}
+    for batch in batches(rows, batch_size):
+        result = session.execute_write(lambda tx: [r.data() for r in tx.run(cypher, rows=batch)])
+        for record in result:
+            ids[tuple(record["key"])] = record["id"]
+    return ids
+
+
+def write_batch(cypher, batch):
+    """
+    Runs one relationship batch on its own session (used by the worker pool).
+    execute_write retries transient errors such as lock deadlocks.
+    """
+    with driver.session() as session:
+        session.execute_write(lambda tx: tx.run(cypher, rows=batch).consume())
+    return len(batch)
+
+
+def collect_distinct_nodes(csv_path, batch_size):
+    """
+    One streaming pass over the CSV collecting the distinct node keys.
+    Memory grows with the number of entities, not with the number of rows.
+    """
+    nodes = {"seasons": {}, "teams": {}, "positions": {}, "gameweeks": {},
+             "fixtures": {}, "players": {}, "plays_as": {}, "plays_for": {}}
+
+    for batch in iter_row_batches(csv_path, batch_size):
+        for row in batch:
+            nodes["seasons"].setdefault(row["season"], None)
+            nodes["teams"].setdefault(row["home_team"], None)
+            nodes["teams"].setdefault(row["away_team"], None)
+            nodes["positions"].setdefault(row["position"], None)
+            nodes["gameweeks"].setdefault((row["season"], int(row["GW"])), None)
+            nodes["fixtures"].setdefault(
+                (row["season"], int(row["fixture"])),
+                (int(row["GW"]), row["kickoff_time"], row["home_team"], row["away_team"]),
+            )
+            nodes["players"].setdefault((row["name"], row["element"]), None)
+            nodes["plays_as"].setdefault((row["name"], row["element"], row["position"]), None)
+            nodes["teams"].setdefault(row["player_team"], None)
+            nodes["plays_for"].setdefault((row["name"], row["element"], row["player_team"], row["season"]), None)
+
+    return nodes
+
+
+def load_phased(csv_path, batch_size=1000, workers=4, manifest=None):
+    """
+    Phase 1 bulk-creates the distinct Season/Team/Position/Gameweek/Fixture/Player
+    nodes (plus their structural edges) on one session.
+    Phase 2 streams the CSV again and creates one PLAYED_IN edge per row,
+    spread over `workers` sessions with at most 2 * workers batches in flight.
+    Expects an empty graph.
+    """
+    start = time.time()
+    nodes = collect_distinct_nodes(csv_path, batch_size)
+
+    with driver.session() as session:
+        seasons = [{"key": [s], "season": s} for s in nodes["seasons"]]
+        season_ids = create_nodes(session, SEASON_NODES, seasons, batch_size)
+
+        teams = [{"key": [t], "name": t, "search_name": search_key(t)} for t in nodes["teams"]]
+        team_ids = create_nodes(session, TEAM_NODES, teams, batch_size)
+
+        positions = [{"key": [p], "name": p} for p in nodes["positions"]]
+        position_ids = create_nodes(session, POSITION_NODES, positions, batch_size)
+
+        gameweeks = [
+            {"key": [season, gw], "season": season, "GW": gw, "season_id": season_ids[(season,)]}
+            for season, gw in nodes["gameweeks"]
+        ]
+        gw_ids = create_nodes(session, GAMEWEEK_NODES, gameweeks, batch_size)
+
+        fixtures = [
+            {"key": [season, fixture], "season": season, "fixture": fixture,
+             "kickoff_time": kickoff_time,
+             "gw_id": gw_ids[(season, gw)],
+             "home_id": team_ids[(home_team,)],
+             "away_id": team_ids[(away_team,)]}
+            for (season, fixture), (gw, kickoff_time, home_team, away_team) in nodes["fixtures"].items()
+        ]
+        fixture_ids = create_nodes(session, FIXTURE_NODES, fixtures, batch_size)
+
+        players = [
+            {"key": [name, element], "name": name, "element": element, "search_name": search_key(name)}
+            for name, element in nodes["players"]
+        ]
+        player_ids = create_nodes(session, PLAYER_NODES, players, batch_size)
+
+        plays_as = [
+            {"player_id": player_ids[(name, element)], "position_id": position_ids[(position,)]}
+            for name, element, position in nodes["plays_as"]
+        ]
+        for batch in batches(plays_as, batch_size):
+            session.execute_write(lambda tx: tx.run(PLAYS_AS_EDGES, rows=batch).consume())
+
+        plays_for = [
+            {"player_id": player_ids[(name, element)], "team_id": team_ids[(team,)], "season": season}
+            for name, element, team, season in nodes["plays_for"]
+        ]
+        for batch in batches(plays_for, batch_size):
+            session.execute_write(lambda tx: tx.run(PLAYS_FOR_EDGES, rows=batch).consume())
+
+    node_count = len(seasons) + len(teams) + len(positions) + len(gameweeks) + len(fixtures) + len(players)
+    print(f"Phase 1: created {node_count} nodes in {time.time() - start:.1f}s")
+
+    # Phase 2: PLAYED_IN edges, one per CSV row
+    phase_start = time.time()
+    done = 0
+
+    def played_in_rows(batch):
+        # Copies, so the manifest hashes the CSV rows and not the node ids
+        return [
+            {**row,
+             "player_id": player_ids[(row["name"], row["element"])],
+             "fixture_id": fixture_ids[(row["season"], int(row["fixture"]))]}
+            for row in batch
+        ]
+
+    # A batch goes into the manifest only once its edges are written (as in
+    # load_delta), so a failed load never marks unwritten rows as ingested
+    def finish(future):
+        written = future.result()
+        if manifest is not None:
+            manifest.record(batches_in_flight.pop(future))
+        return written
+
+    batches_in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for batch in iter_row_batches(csv_path, batch_size):
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done += finish(future)
+                print(f"Phase 2: {done} rows ({done / (time.time() - phase_start):.0f} rows/sec)")
+            future = pool.submit(write_batch, PLAYED_IN_EDGES, played_in_rows(batch))
+            batches_in_flight[future] = batch
+            pending.add(future)
+
+        for future in wait(pending).done:
+            done += finish(future)
+
+    elapsed = time.time() - start
+    print(f"Loaded {done} rows in {elapsed:.1f}s ({done / elapsed:.0f} rows/sec, "
+          f"batch_size={batch_size}, workers={workers})")
+
+
+def load_merge(csv_path, batch_size=1000, manifest=None):
+    """
+    Original loader: one MERGE-everything UNWIND per batch on a single session.
+    """
+    start = time.time()
+    total_rows = 0
+
+    with driver.session() as session:
+        for batch in iter_row_batches(csv_path, batch_size):
+            # Committed before the manifest marks the rows as ingested
+            session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+            if manifest is not None:
+                manifest.record(batch)
+            print(f"Processed rows {total_rows} to {total_rows + len(batch)}")
+            total_rows += len(batch)
+
+    elapsed = time.time() - start
+    print(f"Loaded {total_rows} rows in {elapsed:.1f}s ({total_rows / elapsed:.0f} rows/sec)")
+
+
+#--------------------------------------------
+# Offline export in the neo4j-admin import format
+#--------------------------------------------
+PLAYED_IN_INT_STATS = [
+    "minutes", "goals_scored", "assists", "total_points", "bonus", "clean_sheets",
+    "goals_conceded", "own_goals", "penalties_saved", "penalties_missed",
+    "yellow_cards", "red_cards", "saves", "bps",
+]
+PLAYED_IN_FLOAT_STATS = ["influence", "creativity", "threat", "ict_index", "form"]
+
+
+def _import_int(value):
+    # Empty cells are skipped by neo4j-admin, matching toInteger(null) = null
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return int(float(value))
+
+
+def _import_float(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return float(value)
+
+
+def _write_import_file(out_dir, file_name, header, rows):
+    path = os.path.join(out_dir, file_name)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+
+def export_import_files(csv_path, out_dir=EXPORT_DIR, batch_size=1000, manifest=None):
+    """
+    Writes deduplicated node and relationship CSVs for `neo4j-admin database import full`.
+    Natural keys are used as ids inside one ID space per label, so no ids are invented.
+    The node and structural edge files come from one streaming pass, PLAYED_IN from a second.
+    """
+    start = time.time()
+    os.makedirs(out_dir, exist_ok=True)
+    nodes = collect_distinct_nodes(csv_path, batch_size)
+
+    def gw_id(season, gw):
+        return f"{season}|{gw}"
+
+    def fixture_id(season, fixture):
+        return f"{season}|{fixture}"
+
+    def player_id(name, element):
+        return f"{name}|{element}"
+
+    node_files = {
+        "Season": _write_import_file(
+            out_dir, "season_nodes.csv", ["season_name:ID(Season)"],
+            ([season] for season in nodes["seasons"])),
+        "Team": _write_import_file(
+            out_dir, "team_nodes.csv", ["name:ID(Team)", "search_name"],
+            ([team, search_key(team)] for team in nodes["teams"])),
+        "Position": _write_import_file(
+            out_dir, "position_nodes.csv", ["name:ID(Position)"],
+            ([position] for position in nodes["positions"])),
+        "Gameweek": _write_import_file(
+            out_dir, "gameweek_nodes.csv", [":ID(Gameweek)", "season", "GW_number:int"],
+            ([gw_id(season, gw), season, gw] for season, gw in nodes["gameweeks"])),
+        "Fixture": _write_import_file(
+            out_dir, "fixture_nodes.csv", [":ID(Fixture)", "season", "fixture_number:int", "kickoff_time"],
+            ([fixture_id(season, fixture), season, fixture, kickoff_time]
+             for (season, fixture), (_, kickoff_time, _, _) in nodes["fixtures"].items())),
+        "Player": _write_import_file(
+            out_dir, "player_nodes.csv", [":ID(Player)", "player_name", "player_element:int", "search_name"],
+            ([player_id(name, element), name, element, search_key(name)] for name, element in nodes["players"])),
+    }
+
+    relationship_files = {
+        "HAS_GW": _write_import_file(
+            out_dir, "has_gw.csv", [":START_ID(Season)", ":END_ID(Gameweek)"],
+            ([season, gw_id(season, gw)] for season, gw in nodes["gameweeks"])),
+        "HAS_FIXTURE": _write_import_file(
+            out_dir, "has_fixture.csv", [":START_ID(Gameweek)", ":END_ID(Fixture)"],
+            ([gw_id(season, gw), fixture_id(season, fixture)]
+             for (season, fixture), (gw, _, _, _) in nodes["fixtures"].items())),
+        "HAS_HOME_TEAM": _write_import_file(
+            out_dir, "has_home_team.csv", [":START_ID(Fixture)", ":END_ID(Team)"],
+            ([fixture_id(season, fixture), home_team]
+             for (season, fixture), (_, _, home_team, _) in nodes["fixtures"].items())),
+        "HAS_AWAY_TEAM": _write_import_file(
+            out_dir, "has_away_team.csv", [":START_ID(Fixture)", ":END_ID(Team)"],
+            ([fixture_id(season, fixture), away_team]
+             for (season, fixture), (_, _, _, away_team) in nodes["fixtures"].items())),
+        "PLAYS_AS": _write_import_file(
+            out_dir, "plays_as.csv", [":START_ID(Player)", ":END_ID(Position)"],
+            ([player_id(name, element), position] for name, element, position in nodes["plays_as"])),
+        "PLAYS_FOR": _write_import_file(
+            out_dir, "plays_for.csv", [":START_ID(Player)", ":END_ID(Team)", "season"],
+            ([player_id(name, element), team, season] for name, element, team, season in nodes["plays_for"])),
+    }
+
+    # PLAYED_IN: one edge per CSV row, streamed straight to disk
+    played_in_path = os.path.join(out_dir, "played_in.csv")
+    total_rows = 0
+    with open(played_in_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            [":START_ID(Player)", ":END_ID(Fixture)"]
+            + [f"{stat}:int" for stat in PLAYED_IN_INT_STATS]
+            + [f"{stat}:float" for stat in PLAYED_IN_FLOAT_STATS]
+        )
+        for batch in iter_row_batches(csv_path, batch_size):
+            if manifest is not None:
+                manifest.record(batch)
+            writer.writerows(
+                [player_id(row["name"], row["element"]), fixture_id(row["season"], int(row["fixture"]))]
+                + [_import_int(row.get(stat)) for stat in PLAYED_IN_INT_STATS]
+                + [_import_float(row.get(stat)) for stat in PLAYED_IN_FLOAT_STATS]
+                for row in batch
+            )
+            total_rows += len(batch)
+    relationship_files["PLAYED_IN"] = played_in_path
+
+    elapsed = time.time() - start
+    print(f"Exported {total_rows} rows to {out_dir}/ in {elapsed:.1f}s")
+    command = ["neo4j-admin database import full neo4j --overwrite-destination"]
+    command += [f"--nodes={label}={path}" for label, path in node_files.items()]
+    command += [f"--relationships={rel_type}={path}" for rel_type, path in relationship_files.items()]
+    print("Import into a fresh (stopped) database with:")
+    print("  " + " \\\n    ".join(command))
+
+
+#--------------------------------------------
+# Delta ingest: row-hash manifest keyed by (season, GW, fixture, element)
+#--------------------------------------------
+def row_key(row):
+    return f"{row['season']}|{int(row['GW'])}|{int(row['fixture'])}|{row['element']}"
+
+
+def _canonical(value):
+    # Chunked reads infer dtypes per chunk, so 3 and 3.0 must hash the same
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+# Columns iter_row_batches computes from the CSV ones; left out of the hash so
+# adding one does not make every row look changed
+DERIVED_ROW_FIELDS = {"name_key", "home_team_key", "away_team_key", "player_team", "player_team_key"}
+
+
+def row_hash(row):
+    payload = json.dumps({k: _canonical(v) for k, v in row.items() if k not in DERIVED_ROW_FIELDS},
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    Row-hash manifest stored in SQLite, so it is never loaded into memory whole.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS row_hashes (key TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+
+    def reset(self):
+        self.conn.execute("DELETE FROM row_hashes")
+        self.conn.commit()
+
+    def diff(self, batch):
+        """
+        Returns (new rows, changed rows) of `batch` compared to the manifest.
+        """
+        hashed = [(row_key(row), row_hash(row), row) for row in batch]
+        keys = [key for key, _, _ in hashed]
+        known = {}
+        # Older SQLite builds cap bound parameters at 999 per statement
+        for chunk in batches(keys, 900):
+            placeholders = ",".join("?" * len(chunk))
+            known.update(self.conn.execute(
+                f"SELECT key, hash FROM row_hashes WHERE key IN ({placeholders})", chunk
+            ))
+
+        new_rows, changed_rows = [], []
+        for key, digest, row in hashed:
+            if key not in known:
+                new_rows.append(row)
+            elif known[key] != digest:
+                changed_rows.append(row)
+        return new_rows, changed_rows
+
+    def record(self, batch):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO row_hashes (key, hash) VALUES (?, ?)",
+            [(row_key(row), row_hash(row)) for row in batch],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def load_delta(csv_path, manifest, batch_size=1000):
+    """
+    Upserts only the rows whose hash is new or differs from the manifest.
+    The graph is not wiped, so untouched nodes keep their embeddings.
+    Keys missing from the CSV are kept in the manifest (and in the graph),
+    so a CSV holding only the latest gameweek is a valid delta input.
+    A batch is recorded in the manifest only after it has been written.
+    """
+    start = time.time()
+    new_count = changed_count = unchanged_count = 0
+    touched_players = set()
+
+    with driver.session() as session:
+        for batch in iter_row_batches(csv_path, batch_size):
+            new_rows, changed_rows = manifest.diff(batch)
+            upserts = new_rows + changed_rows
+            if upserts:
+                session.execute_write(lambda tx: tx.run(query, rows=upserts).consume())
+                manifest.record(upserts)
+                touched_players.update((row["name"], row["element"]) for row in upserts)
+
+            new_count += len(new_rows)
+            changed_count += len(changed_rows)
+            unchanged_count += len(batch) - len(upserts)
+
+    elapsed = time.time() - start
+    print(f"Delta: {new_count} new, {changed_count} changed, {unchanged_count} unchanged rows")
+    print(f"Upserted {new_count + changed_count} rows in {elapsed:.1f}s")
+    return touched_players
+
+
+#--------------------------------------------
+# Derived data: per-player-per-season aggregates
+#--------------------------------------------
+# Rebuilt from PLAYED_IN after every load, so retrieval reads one node per
+# player and season instead of re-summing every match on each request.
+
+PLAYER_SEASON_STATS_BODY = """
+MATCH (p)-[r:PLAYED_IN]->(f:Fixture)<-[:HAS_FIXTURE]-(:Gameweek)<-[:HAS_GW]-(s:Season)
+WITH p, s.season_name AS season,
+     count(r) AS appearances,
+     sum(r.total_points) AS total_points,
+     sum(r.goals_scored) AS goals_scored,
+     sum(r.assists) AS assists,
+     sum(r.minutes) AS minutes,
+     sum(r.clean_sheets) AS clean_sheets,
+     sum(r.goals_conceded) AS goals_conceded,
+     sum(r.bonus) AS bonus,
+     sum(r.bps) AS bps,
+     sum(r.saves) AS saves,
+     sum(r.influence) AS influence,
+     sum(r.creativity) AS creativity,
+     sum(r.threat) AS threat,
+     sum(r.ict_index) AS ict_index
+MERGE (p)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats {player_name: p.player_name, player_element: p.player_element, season: season})
+SET ps.appearances = appearances,
+    ps.total_points = total_points,
+    ps.goals_scored = goals_scored,
+    ps.assists = assists,
+    ps.minutes = minutes,
+    ps.clean_sheets = clean_sheets,
+    ps.goals_conceded = goals_conceded,
+    ps.bonus = bonus,
+    ps.bps = bps,
+    ps.saves = saves,
+    ps.influence = influence,
+    ps.creativity = creativity,
+    ps.threat = threat,
+    ps.ict_index = ict_index,
+    ps.points_per_90 = CASE WHEN minutes > 0 THEN toFloat(total_points) / minutes * 90 ELSE null END
+"""
+
+ALL_PLAYER_SEASON_STATS = """
+MATCH (p:Player)
+CALL {
+    WITH p
+""" + PLAYER_SEASON_STATS_BODY + """
+} IN TRANSACTIONS OF 500 ROWS
+"""
+
+SOME_PLAYER_SEASON_STATS = """
+UNWIND $players AS key
+MATCH (p:Player {player_name: key.name, player_element: key.element})
+CALL {
+    WITH p
+""" + PLAYER_SEASON_STATS_BODY + """
+}
+"""
+
+
+def refresh_player_season_stats(players=None, batch_size=1000):
+    """
+    Rebuilds PlayerSeasonStats for all players, or only for the given
+    (player_name, player_element) pairs (delta ingest).
+    """
+    start = time.time()
+    with driver.session() as session:
+        if players is None:
+            session.run(ALL_PLAYER_SEASON_STATS).consume()
+        else:
+            keys = [{"name": name, "element": element} for name, element in players]
+            for batch in batches(keys, batch_size):
+                session.execute_write(lambda tx: tx.run(SOME_PLAYER_SEASON_STATS, players=batch).consume())
+    scope = "all players" if players is None else f"{len(players)} players"
+    print(f"Refreshed PlayerSeasonStats for {scope} in {time.time() - start:.1f}s")
+
+
+#--------------------------------------------
+# Derived data: rolling form windows per player and gameweek
+#--------------------------------------------
+# One PlayerForm node per player, season and gameweek played, holding the
+# 3- and 5-gameweek windows ending at that gameweek. `season_latest` marks the
+# last gameweek of each season and `latest` the last one overall. Form
+# rankings read `season_latest` within one season (the latest by default), so
+# players whose last game was seasons ago never rank, and stay a single
+# indexed top-k read.
+
+PLAYER_FORM_BODY = """
+MATCH (p)-[r:PLAYED_IN]->(:Fixture)<-[:HAS_FIXTURE]-(gw:Gameweek)
+WITH p, gw.season AS season, gw.GW_number AS gw_number,
+     sum(r.total_points) AS points,
+     sum(r.ict_index) AS ict,
+     sum(r.minutes) AS minutes
+ORDER BY season, gw_number
+WITH p, season, collect({gw: gw_number, points: points, ict: ict, minutes: minutes}) AS games
+UNWIND range(0, size(games) - 1) AS i
+WITH p, season, games, i,
+     games[CASE WHEN i >= 2 THEN i - 2 ELSE 0 END..i + 1] AS w3,
+     games[CASE WHEN i >= 4 THEN i - 4 ELSE 0 END..i + 1] AS w5
+MERGE (p)-[:HAS_FORM]->(pf:PlayerForm {player_name: p.player_name, player_element: p.player_element, season: season, GW_number: games[i].gw})
+SET pf.points_3 = reduce(s = 0, g IN w3 | s + g.points),
+    pf.points_5 = reduce(s = 0, g IN w5 | s + g.points),
+    pf.ict_3 = reduce(s = 0.0, g IN w3 | s + g.ict) / size(w3),
+    pf.ict_5 = reduce(s = 0.0, g IN w5 | s + g.ict) / size(w5),
+    pf.minutes_3 = reduce(s = 0, g IN w3 | s + g.minutes),
+    pf.minutes_5 = reduce(s = 0, g IN w5 | s + g.minutes),
+    pf.recent_gameweeks = [g IN reverse(w5) | g.gw],
+    pf.recent_points = [g IN reverse(w5) | g.points],
+    pf.season_latest = (i = size(games) - 1)
+WITH DISTINCT p
+MATCH (p)-[:HAS_FORM]->(pf:PlayerForm)
+WITH p, pf ORDER BY pf.season DESC, pf.GW_number DESC
+WITH p, collect(pf) AS forms
+UNWIND range(0, size(forms) - 1) AS i
+WITH forms[i] AS pf, i
+SET pf.latest = (i = 0)
+"""
+
+ALL_PLAYER_FORM = """
+MATCH (p:Player)
+CALL {
+    WITH p
+""" + PLAYER_FORM_BODY + """
+} IN TRANSACTIONS OF 500 ROWS
+"""
+
+SOME_PLAYER_FORM = """
+UNWIND $players AS key
+MATCH (p:Player {player_name: key.name, player_element: key.element})
+CALL {
+    WITH p
+""" + PLAYER_FORM_BODY + """
+}
+"""
+
+
+def refresh_player_form(players=None, batch_size=1000):
+    """
+    Rebuilds PlayerForm windows for all players, or only for the given
+    (player_name, player_element) pairs (delta ingest).
+    """
+    start = time.time()
+    with driver.session() as session:
+        if players is None:
+            session.run(ALL_PLAYER_FORM).consume()
+        else:
+            keys = [{"name": name, "element": element} for name, element in players]
+            for batch in batches(keys, batch_size):
+                session.execute_write(lambda tx: tx.run(SOME_PLAYER_FORM, players=batch).consume())
+    scope = "all players" if players is None else f"{len(players)} players"
+    print(f"Refreshed PlayerForm for {scope} in {time.time() - start:.1f}s")
+
+
+def refresh_derived(players=None):
+    refresh_player_season_stats(players)
+    refresh_player_form(players)
+
+
+#--------------------------------------------
+# Snapshot / restore (Parquet, embeddings included)
+#--------------------------------------------
+# One Parquet file per node label and relationship type, plus the delta
+# manifest, so a new environment restores the loaded and embedded graph
+# without re-running the ingest or the embedding models.
+
+SNAPSHOT_NODES = "MATCH (n:`{label}`) RETURN elementId(n) AS id, properties(n) AS props"
+
+SNAPSHOT_RELATIONSHIPS = """
+MATCH (a)-[r:`{rel_type}`]->(b)
+RETURN elementId(a) AS start, elementId(b) AS end, properties(r) AS props
+"""
+
+# Vectors go through setNodeVectorProperty so float32 storage stays float32
+# (a plain SET would write them back as float64 lists)
+RESTORE_NODES = """
+UNWIND $rows AS row
+CREATE (n:`{label}`)
+SET n = row.props
+WITH row, n
+CALL {{
+    WITH row, n
+    UNWIND row.vectors AS vector
+    CALL db.create.setNodeVectorProperty(n, vector.property, vector.values)
+}}
+RETURN row.key AS key, elementId(n) AS id
+"""
+
+RESTORE_RELATIONSHIPS = """
+UNWIND $rows AS row
+MATCH (a) WHERE elementId(a) = row.start
+MATCH (b) WHERE elementId(b) = row.end
+CREATE (a)-[r:`{rel_type}`]->(b)
+SET r = row.props
+"""
+
+
+def _null_nan(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def _snapshot_table(rows):
+    """
+    Builds an Arrow table from property dicts, storing float lists
+    (the embedding vectors) as float32.
+    """
+    # from_pylist would take the columns from the first row only. Missing
+    # values read through pandas are NaN, which Arrow rejects in a string column.
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    table = pa.table({column: [_null_nan(row.get(column)) for row in rows] for column in columns})
+    for i, field in enumerate(table.schema):
+        if pa.types.is_list(field.type) and pa.types.is_floating(field.type.value_type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.list_(pa.float32())))
+    return table
+
+
+def snapshot_graph(out_dir, manifest_path):
+    """
+    Dumps every node label and relationship type to `out_dir`.
+    """
+    start = time.time()
+    os.makedirs(os.path.join(out_dir, "nodes"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "relationships"), exist_ok=True)
+    contents = {"nodes": {}, "relationships": {}}
+
+    with driver.session() as session:
+        labels = [r["label"] for r in session.run("CALL db.labels() YIELD label RETURN label")]
+        for label in labels:
+            rows = [{"_id": r["id"], **r["props"]}
+                    for r in session.run(SNAPSHOT_NODES.format(label=label))]
+            if rows:
+                pq.write_table(_snapshot_table(rows), os.path.join(out_dir, "nodes", f"{label}.parquet"))
+                contents["nodes"][label] = len(rows)
+
+        rel_types = [r["relationshipType"] for r in session.run(
+            "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType")]
+        for rel_type in rel_types:
+            rows = [{"_start": r["start"], "_end": r["end"], **r["props"]}
+                    for r in session.run(SNAPSHOT_RELATIONSHIPS.format(rel_type=rel_type))]
+            if rows:
+                pq.write_table(_snapshot_table(rows), os.path.join(out_dir, "relationships", f"{rel_type}.parquet"))
+                contents["relationships"][rel_type] = len(rows)
+
+    if os.path.exists(manifest_path):
+        shutil.copyfile(manifest_path, os.path.join(out_dir, os.path.basename(manifest_path)))
+    with open(os.path.join(out_dir, "snapshot.json"), "w") as f:
+        json.dump(contents, f, indent=2)
+
+    print(f"Snapshot of {sum(contents['nodes'].values())} nodes and "
+          f"{sum(contents['relationships'].values())} relationships written to {out_dir} "
+          f"in {time.time() - start:.1f}s")
+
+
+def _restore_rows(path):
+    """
+    Reads a snapshot file back into property dicts, dropping nulls.
+    """
+    for row in pq.read_table(path).to_pylist():
+        yield {key: value for key, value in row.items() if value is not None}
+
+
+def _split_vectors(props):
+    """
+    Moves the float32 embedding properties out of `props` into
+    [{property, values}] for setNodeVectorProperty.
+    """
+    if EMBEDDING_STORAGE != "float32":
+        return []
+    return [{"property": prop, "values": props.pop(prop)}
+            for prop in [f"embedding_{model}" for model in EMBEDDING_DIMENSIONS]
+            if isinstance(props.get(prop), list)]
+
+
+def restore_graph(in_dir, manifest_path, batch_size):
+    """
+    Replaces the database with the snapshot in `in_dir`.
+    """
+    start = time.time()
+    with open(os.path.join(in_dir, "snapshot.json")) as f:
+        contents = json.load(f)
+    # Built before the wipe, so a broken template cannot leave an empty database
+    node_queries = {label: RESTORE_NODES.format(label=label) for label in contents["nodes"]}
+    relationship_queries = {rel_type: RESTORE_RELATIONSHIPS.format(rel_type=rel_type)
+                            for rel_type in contents["relationships"]}
+
+    with driver.session() as session:
+        session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+
+    bootstrap_schema(driver)
+
+    # Snapshot elementIds -> elementIds in this database
+    ids = {}
+    with driver.session() as session:
+        for label in contents["nodes"]:
+            rows = [{"key": [props.pop("_id")], "vectors": _split_vectors(props), "props": props}
+                    for props in _restore_rows(os.path.join(in_dir, "nodes", f"{label}.parquet"))]
+            created = create_nodes(session, node_queries[label], rows, batch_size)
+            ids.update({old_id: new_id for (old_id,), new_id in created.items()})
+            print(f"Restored {len(rows)} {label} nodes")
+
+        for rel_type in contents["relationships"]:
+            rows = []
+            for props in _restore_rows(os.path.join(in_dir, "relationships", f"{rel_type}.parquet")):
+                rows.append({"start": ids[props.pop("_start")], "end": ids[props.pop("_end")], "props": props})
+            cypher = relationship_queries[rel_type]
+            for batch in batches(rows, batch_size):
+                session.execute_write(lambda tx: tx.run(cypher, rows=batch).consume())
+            print(f"Restored {len(rows)} {rel_type} relationships")
+
+    snapshot_manifest = os.path.join(in_dir, os.path.basename(manifest_path))
+    if os.path.exists(snapshot_manifest):
+        shutil.copyfile(snapshot_manifest, manifest_path)
 
+    print(f"Restored snapshot from {in_dir} in {time.time() - start:.1f}s")
 
-driver.close()
 
+def main():
+    parser = argparse.ArgumentParser(description="Build the FPL knowledge graph from the gameweek CSV.")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--mode", choices=["merge", "phased", "delta", "export", "schema", "snapshot", "restore"],
+                        default="merge",
+                        help="merge: original single-session MERGE loader; "
+                             "phased: bulk-create nodes, then PLAYED_IN edges in parallel; "
+                             "delta: upsert only new or changed rows, keeping the graph; "
+                             "export: write neo4j-admin import files instead of loading; "
+                             "schema: create constraints and indexes and rebuild derived data (e.g. after an import); "
+                             "snapshot: dump the graph, embeddings included, to Parquet; "
+                             "restore: replace the graph with a snapshot")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="rows per transaction; also the CSV chunk size")
+    parser.add_argument("--workers", type=int, default=4, help="worker sessions for the phased loader")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="row-hash manifest used by delta mode")
+    parser.add_argument("--out-dir", default=EXPORT_DIR, help="output directory for export mode")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help="directory for snapshot and restore modes")
+    args = parser.parse_args()
 
+    if args.mode == "snapshot":
+        snapshot_graph(args.snapshot_dir, args.manifest)
+        driver.close()
+        return
 
+    if args.mode == "restore":
+        restore_graph(args.snapshot_dir, args.manifest, batch_size=args.batch_size)
+        bump_kg_version(driver)
+        driver.close()
+        return
 
+    if args.mode == "schema":
+        bootstrap_schema(driver)
+        backfill_search_keys(driver)
+        refresh_derived()
+        bump_kg_version(driver)
+        driver.close()
+        return
 
+    manifest = Manifest(args.manifest)
 
+    if args.mode == "delta":
+        bootstrap_schema(driver)
+        touched_players = load_delta(args.csv, manifest, batch_size=args.batch_size)
+        if touched_players:
+            refresh_derived(touched_players)
+            bump_kg_version(driver)
+    elif args.mode == "export":
+        # The import replaces the database, so the manifest describes this CSV afterwards
+        manifest.reset()
+        export_import_files(args.csv, out_dir=args.out_dir, batch_size=args.batch_size, manifest=manifest)
+        print("After the import, run: python Create_kg.py --mode schema")
+    else:
+        with driver.session() as session:
+            session.run("MATCH (n) DETACH DELETE n")
 
+        bootstrap_schema(driver)
 
+        # A full rebuild resets the manifest, so the next delta run starts from it
+        manifest.reset()
 
+        if args.mode == "phased":
+            load_phased(args.csv, batch_size=args.batch_size, workers=args.workers, manifest=manifest)
+        else:
+            load_merge(args.csv, batch_size=args.batch_size, manifest=manifest)
 
+        refresh_derived()
+        bump_kg_version(driver)
 
+    manifest.close()
+    driver.close()
 
 
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 from neo4j import GraphDatabase
+from concurrent.futures import ThreadPoolExecutor
 import os
 
+from GraphRetrievalLayer.schema import search_key
+from GraphRetrievalLayer.result_cache import result_cache
+from GraphRetrievalLayer.entity_resolution import get_gazetteer, resolve_entities
+
 # Neo4j connection
 URI = os.getenv("URI")
 USERNAME = os.getenv("NeoName")
@@ -8,10 +13,14 @@ PASSWORD = os.getenv("PASSWORD")
 
 driver = GraphDatabase.driver(URI, auth=(USERNAME, PASSWORD))
 
+# Upper bound on the queries of one intent running at the same time
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "4"))
+
 class GraphRetrieval:
 
-    def __init__(self):
+    def __init__(self, max_concurrency=MAX_CONCURRENT_QUERIES):
         self.driver = driver
+        self.max_concurrency = max_concurrency
 
     # def close(self):
     #     self.driver.close()
@@ -20,23 +29,25 @@ class GraphRetrieval:
     # Helper: run query and return results
     #--------------------------------------------
     def _run_query(self, cypher, params=None):
+        """
+        Runs `cypher`, or returns its cached result for the same params and KG version.
+        """
+        params = params or {}
+        return result_cache.get_or_run(self.driver, cypher, params, lambda: self._execute_query(cypher, params))
+
+    def _execute_query(self, cypher, params):
         with self.driver.session() as session:
-            result = session.run(cypher, params or {})
+            result = session.run(cypher, params)
             return [dict(r) for r in result]
 
     #---------------------------------------------
-    # Retrieve KG context with entities & intent
+    # Cypher queries for an intent
     #---------------------------------------------
-    def retrieve_kg_context(self, entities, intent):
+    def build_queries(self, intent, gameweek=None):
         """
-        entities: dict with keys
-        - player_name: list[str]
-        - team: list[str]
-        - position: list[str]
-        - gameweek: list[int]
-        - season: list[str]
-        - statistic: list[str]
-        intent: str, returned by classify_intent()
+        Returns the list of Cypher queries run for `intent`.
+        All of them take the same parameters (see retrieve_kg_context).
+        `gameweek` only selects which form snapshot the recommendation reads.
         """
         queries = []
 
@@ -46,40 +57,38 @@ class GraphRetrieval:
         if intent == "player_stats":
             # 1. Detailed Season Overview
             queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-                WHERE ($player_name IS NULL OR toLower(p.player_name) CONTAINS toLower($player_name))
-                  AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-                RETURN p.player_name AS player, 
-                       s.season_name AS season,
-                       sum(r.minutes) AS minutes,
-                       sum(r.goals_scored) AS goals, 
-                       sum(r.assists) AS assists, 
-                       sum(r.clean_sheets) AS clean_sheets,
-                       sum(r.total_points) AS total_points,
-                       sum(r.bonus) AS total_bonus
+                MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
+                WHERE ($player_key IS NULL OR p.search_name = $player_key)
+                  AND ($season IS NULL OR ps.season = $season)
+                RETURN p.player_name AS player,
+                       ps.season AS season,
+                       sum(ps.minutes) AS minutes,
+                       sum(ps.goals_scored) AS goals,
+                       sum(ps.assists) AS assists,
+                       sum(ps.clean_sheets) AS clean_sheets,
+                       sum(ps.total_points) AS total_points,
+                       sum(ps.bonus) AS total_bonus
             """)
 
-            # 2. Recent Form (Last 5 Games Played)
+            # 2. Recent Form (Last 5 Gameweeks Played)
             queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-                WHERE ($player_name IS NULL OR toLower(p.player_name) CONTAINS toLower($player_name))
-                  AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-                WITH p, r, gw ORDER BY gw.GW_number DESC LIMIT 5
-                RETURN p.player_name AS player, 
-                       collect(gw.GW_number) as recent_gameweeks,
-                       collect(r.total_points) as recent_points,
-                       avg(r.ict_index) as avg_ict_form
+                MATCH (p:Player)-[:HAS_FORM]->(pf:PlayerForm)
+                WHERE ($player_key IS NULL OR p.search_name = $player_key)
+                  AND CASE WHEN $season IS NULL THEN pf.latest
+                           ELSE pf.season_latest AND pf.season = $season END
+                RETURN p.player_name AS player,
+                       pf.recent_gameweeks as recent_gameweeks,
+                       pf.recent_points as recent_points,
+                       pf.ict_5 as avg_ict_form
             """)
 
             # 3. Efficiency (Points per 90)
             queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-                WHERE ($player_name IS NULL OR toLower(p.player_name) CONTAINS toLower($player_name))
-                WITH p, sum(r.total_points) as pts, sum(r.minutes) as mins
+                MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
+                WHERE ($player_key IS NULL OR p.search_name = $player_key)
+                WITH p, sum(ps.total_points) as pts, sum(ps.minutes) as mins
                 WHERE mins > 0
-                RETURN p.player_name AS player, 
+                RETURN p.player_name AS player,
                        (toFloat(pts) / mins * 90) AS points_per_90
             """)
 
@@ -89,47 +98,43 @@ class GraphRetrieval:
         elif intent == "top_players":
             # 1. Top Point Scorers
             queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
+                MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
                 MATCH (p)-[:PLAYS_AS]->(pos:Position)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
                 WHERE ($position IS NULL OR toLower(pos.name) CONTAINS toLower($position))
-                  AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-                RETURN p.player_name AS player, pos.name AS position, sum(r.total_points) AS total_points
+                  AND ($season IS NULL OR ps.season = $season)
+                RETURN p.player_name AS player, pos.name AS position, sum(ps.total_points) AS total_points
                 ORDER BY total_points DESC
                 LIMIT 10
             """)
 
             # 2. Golden Boot (Goals)
             queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-                WHERE ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-                RETURN p.player_name AS player, sum(r.goals_scored) AS goals
+                MATCH (ps:PlayerSeasonStats)
+                WHERE ($season IS NULL OR ps.season = $season)
+                RETURN ps.player_name AS player, sum(ps.goals_scored) AS goals
                 ORDER BY goals DESC
                 LIMIT 5
             """)
 
             # 3. Top Playmakers (Assists)
             queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-                WHERE ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-                RETURN p.player_name AS player, sum(r.assists) AS assists, sum(r.ict_index) as creativity_score
+                MATCH (ps:PlayerSeasonStats)
+                WHERE ($season IS NULL OR ps.season = $season)
+                RETURN ps.player_name AS player, sum(ps.assists) AS assists, sum(ps.ict_index) as creativity_score
                 ORDER BY assists DESC
                 LIMIT 5
             """)
 
             # 4. Top Defenders
             queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
+                MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
                 MATCH (p)-[:PLAYS_AS]->(pos:Position)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
                 WHERE pos.name IN ['DEF', 'GK']
-                  AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-                RETURN p.player_name AS player, 
-                       sum(r.clean_sheets) AS clean_sheets, 
-                       sum(r.goals_conceded) as goals_conceded,
-                       sum(r.total_points) as total_points
+                  AND ($season IS NULL OR ps.season = $season)
+                RETURN p.player_name AS player,
+                       sum(ps.clean_sheets) AS clean_sheets,
+                       sum(ps.goals_conceded) as goals_conceded,
+                       sum(ps.total_points) as total_points
                 ORDER BY clean_sheets DESC, total_points DESC
                 LIMIT 5
             """)
@@ -141,7 +146,7 @@ class GraphRetrieval:
             # 1. Upcoming Fixtures for Team
             queries.append("""
                 MATCH (t:Team)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-                WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
+                WHERE t.search_name = $team_key
                   AND f.kickoff_time >= datetime() 
                 WITH f, t
                 MATCH (f)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(opponent:Team)
@@ -158,44 +163,47 @@ class GraphRetrieval:
         # -------------------------------------
         elif intent == "team_analysis":
             
-            # 1. Best Attackers (Goals/Assists in games involving this team)
+            # Squads come from the season-scoped PLAYS_FOR edges; only fixtures
+            # the player's own team played in that season are counted.
+            # 1. Best Attackers (Goals/Assists by the team's own squad)
             queries.append("""
-                MATCH (t:Team)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-                MATCH (p:Player)-[r:PLAYED_IN]->(f)
-                MATCH (p)-[:PLAYS_AS]->(pos:Position)
-                WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
-                    AND pos.name IN ['FW', 'MID']
-                RETURN p.player_name AS player, 
-                       sum(r.goals_scored) AS goals, 
-                       sum(r.assists) AS assists, 
+                MATCH (t:Team)<-[pf:PLAYS_FOR]-(p:Player)-[:PLAYS_AS]->(pos:Position)
+                WHERE t.search_name = $team_key
+                  AND pos.name IN ['FWD', 'MID']
+                MATCH (p)-[r:PLAYED_IN]->(f:Fixture)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]->(t)
+                WHERE f.season = pf.season
+                RETURN p.player_name AS player,
+                       sum(r.goals_scored) AS goals,
+                       sum(r.assists) AS assists,
                        sum(r.total_points) as points
                 ORDER BY points DESC
                 LIMIT 5
             """)
 
-            # 2. Team Defensive Overview (via Clean Sheets in team games)
+            # 2. Team Defensive Overview (Clean Sheets of the team's defenders)
             queries.append("""
-                MATCH (t:Team)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-                MATCH (p:Player)-[r:PLAYED_IN]->(f)
-                MATCH (p)-[:PLAYS_AS]->(pos:Position)
-                WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
+                MATCH (t:Team)<-[pf:PLAYS_FOR]-(p:Player)-[:PLAYS_AS]->(pos:Position)
+                WHERE t.search_name = $team_key
                   AND pos.name IN ['DEF', 'GK']
-                RETURN t.name AS team, 
-                       sum(r.clean_sheets) AS total_clean_sheets, 
+                MATCH (p)-[r:PLAYED_IN]->(f:Fixture)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]->(t)
+                WHERE f.season = pf.season
+                RETURN t.name AS team,
+                       sum(r.clean_sheets) AS total_clean_sheets,
                        sum(r.goals_conceded) AS total_goals_conceded
             """)
 
-            # 3. best players by total points
+            # 3. Best players by total points
             queries.append("""
-                MATCH (t:Team)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-                MATCH (p:Player)-[r:PLAYED_IN]->(f)
-                MATCH (p)-[:PLAYS_AS]->(pos:Position)
-                WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
-                RETURN p.player_name AS player, 
-                       s.season_name AS season,
+                MATCH (t:Team)<-[pf:PLAYS_FOR]-(p:Player)
+                WHERE t.search_name = $team_key
+                  AND ($season IS NULL OR pf.season = $season)
+                MATCH (p)-[r:PLAYED_IN]->(f:Fixture)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]->(t)
+                WHERE f.season = pf.season
+                RETURN p.player_name AS player,
+                       pf.season AS season,
                        sum(r.minutes) AS minutes,
-                       sum(r.goals_scored) AS goals, 
-                       sum(r.assists) AS assists, 
+                       sum(r.goals_scored) AS goals,
+                       sum(r.assists) AS assists,
                        sum(r.clean_sheets) AS clean_sheets,
                        sum(r.total_points) AS total_points,
                        sum(r.bonus) AS total_bonus
@@ -205,14 +213,13 @@ class GraphRetrieval:
 
             # 4. Overall Team Performance (Aggregated Stats)
             queries.append("""
-                MATCH (t:Team)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-                MATCH (p:Player)-[r:PLAYED_IN]->(f)
-                WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
-                  AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-                
+                MATCH (t:Team)<-[pf:PLAYS_FOR]-(p:Player)
+                WHERE t.search_name = $team_key
+                  AND ($season IS NULL OR pf.season = $season)
+                MATCH (p)-[r:PLAYED_IN]->(f:Fixture)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]->(t)
+                WHERE f.season = pf.season
                 RETURN t.name AS team,
-                       s.season_name AS season,
+                       pf.season AS season,
                        count(DISTINCT f) AS games_played,
                        sum(r.goals_scored) AS total_goals,
                        sum(r.assists) AS total_assists,
@@ -227,46 +234,87 @@ class GraphRetrieval:
         elif intent == "recommendation":
             # 1. Value Picks (Points per 90min)
             queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
+                MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
                 MATCH (p)-[:PLAYS_AS]->(pos:Position)
                 WHERE ($position IS NULL OR toLower(pos.name) CONTAINS toLower($position))
-                WITH p, pos, sum(r.total_points) as pts, sum(r.minutes) as mins
+                WITH p, pos, sum(ps.total_points) as pts, sum(ps.minutes) as mins
                 WHERE mins > 500
-                RETURN p.player_name AS player, 
-                       pos.name AS position, 
-                       pts AS total_points, 
+                RETURN p.player_name AS player,
+                       pos.name AS position,
+                       pts AS total_points,
                        (toFloat(pts)/mins * 90) as pts_per_90
                 ORDER BY pts_per_90 DESC
                 LIMIT 5
             """)
 
-            # 2. Form (Last 3 Games)
-            queries.append("""
-                MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)
-                WHERE ($player_name IS NULL OR toLower(p.player_name) CONTAINS toLower($player_name))
-                  AND ($gameweek IS NULL OR toLower(gw.GW_number) CONTAINS toLower($gameweek))
-                WITH p, r, gw ORDER BY gw.GW_number DESC
-                WITH p, collect(r.total_points)[0..3] as recent_points
-                RETURN p.player_name AS player, 
-                       reduce(s = 0, x IN recent_points | s + x) as form_score
+            # 2. Form (Last 3 Gameweeks) in $form_season: its final gameweeks, or
+            # $gameweek when given. The predicate is picked here so the
+            # (season, season_latest, points_3) or the (season, GW_number) index
+            # can serve it.
+            if gameweek is None:
+                form_filter = "pf.season = $form_season AND pf.season_latest = true"
+            else:
+                form_filter = "pf.season = $form_season AND pf.GW_number = $gameweek"
+            queries.append(f"""
+                MATCH (pf:PlayerForm)
+                WHERE {form_filter}
+                  AND pf.points_3 IS NOT NULL
+                MATCH (p:Player)-[:HAS_FORM]->(pf)
+                WHERE ($player_key IS NULL OR p.search_name = $player_key)
+                RETURN p.player_name AS player,
+                       pf.points_3 as form_score
                 ORDER BY form_score DESC
                 LIMIT 5
             """)
 
+        return queries
+
+    #---------------------------------------------
+    # Retrieve KG context with entities & intent
+    #---------------------------------------------
+    def retrieve_kg_context(self, entities, intent):
+        """
+        entities: dict with keys
+        - player_name: list[str]
+        - team: list[str]
+        - position: list[str]
+        - gameweek: list[int | str]
+        - season: list[str]
+        - statistic: list[str]
+        intent: str, returned by classify_intent()
+        """
+        # Canonical names first, so [0] is the best-ranked match of each mention
+        entities = resolve_entities(self.driver, entities)
+
+        params = {
+            "player_name": entities.get("player_name", [None])[0] if entities.get("player_name") else None,
+            "team": entities.get("team", [None])[0] if entities.get("team") else None,
+            "position": entities.get("position", [None])[0] if entities.get("position") else None,
+            "gameweek": entities.get("gameweek", [None])[0] if entities.get("gameweek") else None,
+            "season": entities.get("season", [None])[0] if entities.get("season") else None
+        }
+        # Exact search_name keys of the resolved nodes, bound with equality.
+        # No player named (None) reads every player, as the old "" CONTAINS key did.
+        params["player_key"] = search_key(params["player_name"])
+        params["team_key"] = search_key(params["team"])
+        # Form is ranked within one season: the asked one, else the latest
+        params["form_season"] = params["season"] or get_gazetteer(self.driver).latest_season
+
+        queries = self.build_queries(intent, gameweek=params["gameweek"])
+
         # -------------------------------------
         # Run queries
         # -------------------------------------
+        # The queries are independent: each runs on its own session (the driver
+        # is thread-safe), so the intent costs its slowest query, not the sum.
         all_results = {}
-        for i, cypher in enumerate(queries):
-            params = {
-                "player_name": entities.get("player_name", [None])[0] if entities.get("player_name") else None,
-                "team": entities.get("team", [None])[0] if entities.get("team") else None,
-                "position": entities.get("position", [None])[0] if entities.get("position") else None,
-                "gameweek": entities.get("gameweek", [None])[0] if entities.get("gameweek") else None,
-                "season": entities.get("season", [None])[0] if entities.get("season") else None
-            }
-            results = self._run_query(cypher, params)
-            all_results[f"{intent}_{i+1}"] = results
+        if not queries:
+            return all_results
+
+        workers = max(1, min(self.max_concurrency, len(queries)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._run_query, cypher, params) for cypher in queries]
+            for i, future in enumerate(futures):
+                all_results[f"{intent}_{i+1}"] = future.result()
 
-        return all_results
\ No newline at end of file
+        return all_results
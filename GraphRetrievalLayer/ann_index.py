@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURRENT_DIR)
+sys.path.append(PARENT_DIR)
+
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", "ann_index")
+# Label filters matching at most this many rows are answered by an exact scan
+ANN_EXACT_SCAN_ROWS = int(os.getenv("ANN_EXACT_SCAN_ROWS", "4096"))
+
+
+#--------------------------------------------
+# In-process IVF index over the node embeddings
+#--------------------------------------------
+# Exported from the graph into plain .npy files:
+#   <model>_vectors.npy    float32 (N, dim), unit length, grouped by list
+#   <model>_ids.npy        elementId of each row
+#   <model>_labels.npy     label of each row
+#   <model>_centroids.npy  float32 (n_lists, dim)
+#   <model>_offsets.npy    row where each list starts (n_lists + 1 entries)
+# Everything is opened with mmap_mode="r", so worker processes share the
+# pages through the OS page cache instead of each holding a copy.
+# The index stores elementIds: export it again after a rebuild, restore or re-embed.
+
+EXPORT_VECTORS = """
+MATCH (n)
+WHERE n.{embedding_property} IS NOT NULL
+RETURN elementId(n) AS id, labels(n)[0] AS label, n.{embedding_property} AS vector
+"""
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _assign(vectors, centroids, chunk_size=65536):
+    """
+    Index of the closest centroid (by cosine) for every row.
+    """
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for i in range(0, len(vectors), chunk_size):
+        assignments[i:i + chunk_size] = np.argmax(vectors[i:i + chunk_size] @ centroids.T, axis=1)
+    return assignments
+
+
+def _train_centroids(vectors, n_lists, iterations=10, seed=0):
+    """
+    Spherical k-means: centroids are kept at unit length.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        # Empty lists keep their previous centroid
+        filled = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = _normalize(np.add.reduceat(vectors[order], starts, axis=0))
+    return centroids
+
+
+def export_ann_index(driver, model_choice, out_dir=ANN_INDEX_DIR, n_lists=None):
+    """
+    Reads every `embedding_<model_choice>` vector from the graph and writes the
+    IVF index files to `out_dir`.
+    """
+    start = time.time()
+    with driver.session() as session:
+        records = session.run(EXPORT_VECTORS.format(embedding_property=f"embedding_{model_choice}"))
+        ids, labels, vectors = [], [], []
+        for r in records:
+            ids.append(r["id"])
+            labels.append(r["label"])
+            vector = r["vector"]
+            # float16 storage keeps vectors as packed bytes (see schema.EMBEDDING_STORAGE)
+            if isinstance(vector, (bytes, bytearray)):
+                vector = np.frombuffer(vector, dtype="<f2")
+            vectors.append(vector)
+
+    if not vectors:
+        print(f"No embedding_{model_choice} vectors in the graph, nothing exported")
+        return
+
+    vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+    n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+    n_lists = min(n_lists, len(vectors))
+
+    centroids = _train_centroids(vectors, n_lists)
+    assignments = _assign(vectors, centroids)
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))])
+
+    os.makedirs(out_dir, exist_ok=True)
+    prefix = os.path.join(out_dir, model_choice)
+    np.save(f"{prefix}_vectors.npy", vectors[order])
+    np.save(f"{prefix}_ids.npy", np.asarray(ids)[order])
+    np.save(f"{prefix}_labels.npy", np.asarray(labels)[order])
+    np.save(f"{prefix}_centroids.npy", centroids.astype(np.float32))
+    np.save(f"{prefix}_offsets.npy", offsets.astype(np.int64))
+
+    print(f"Exported {len(vectors)} {model_choice} vectors in {n_lists} lists to {out_dir} "
+          f"in {time.time() - start:.1f}s")
+
+
+class AnnIndex:
+    """
+    Read-only IVF index loaded from the files written by export_ann_index.
+    """
+
+    def __init__(self, model_choice, directory=ANN_INDEX_DIR):
+        prefix = os.path.join(directory, model_choice)
+        self.vectors = np.load(f"{prefix}_vectors.npy", mmap_mode="r")
+        self.ids = np.load(f"{prefix}_ids.npy", mmap_mode="r")
+        self.labels = np.load(f"{prefix}_labels.npy", mmap_mode="r")
+        self.centroids = np.load(f"{prefix}_centroids.npy", mmap_mode="r")
+        self.offsets = np.load(f"{prefix}_offsets.npy", mmap_mode="r")
+        self._label_rows = {}
+
+    @staticmethod
+    def exists(model_choice, directory=ANN_INDEX_DIR):
+        return os.path.exists(os.path.join(directory, f"{model_choice}_offsets.npy"))
+
+    def label_rows(self, labels):
+        """
+        Row numbers of every vector with one of `labels`, computed once per label set.
+        """
+        key = tuple(sorted(labels))
+        if key not in self._label_rows:
+            self._label_rows[key] = np.flatnonzero(np.isin(self.labels, list(key)))
+        return self._label_rows[key]
+
+    def search(self, query_vec, k=5, n_probe=8, labels=None):
+        """
+        Returns up to k (elementId, label, cosine score) tuples, best first.
+        Only the `n_probe` lists closest to the query are scanned.
+        `labels` restricts the hits to those node labels. Labels with at most
+        ANN_EXACT_SCAN_ROWS rows (Team, Season, ...) are scanned exactly; for
+        the others the probe widens, n_probe lists at a time, until k rows of
+        the labels have been seen.
+        """
+        query = _normalize(np.asarray(query_vec, dtype=np.float32))
+        if labels is not None:
+            label_rows = self.label_rows(labels)
+            if len(label_rows) <= ANN_EXACT_SCAN_ROWS:
+                return self._top_k(label_rows, self.vectors[label_rows] @ query if len(label_rows) else
+                                   np.empty(0, dtype=np.float32), k)
+
+        # Lists closest to the query first
+        list_order = np.argsort(-(self.centroids @ query))
+        labels = None if labels is None else list(labels)
+        rows, scores = [], []
+        found = 0
+        for i in range(0, len(list_order), max(1, n_probe)):
+            for list_id in list_order[i:i + n_probe]:
+                # Lists are contiguous row ranges, so each one is a single slice of the mapped matrix
+                start, end = self.offsets[list_id], self.offsets[list_id + 1]
+                list_rows = np.arange(start, end)
+                list_scores = self.vectors[start:end] @ query
+                if labels is not None:
+                    keep = np.isin(self.labels[start:end], labels)
+                    list_rows, list_scores = list_rows[keep], list_scores[keep]
+                rows.append(list_rows)
+                scores.append(list_scores)
+                found += len(list_rows)
+            if found >= k:
+                break
+
+        if not rows:
+            return []
+        return self._top_k(np.concatenate(rows), np.concatenate(scores), k)
+
+    def _top_k(self, rows, scores, k):
+        if len(rows) == 0:
+            return []
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(str(self.ids[rows[i]]), str(self.labels[rows[i]]), float(scores[i])) for i in top]
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from GraphRetrievalLayer.Baseline import driver
+    from GraphRetrievalLayer.schema import EMBEDDING_DIMENSIONS
+
+    parser = argparse.ArgumentParser(description="Export the node embeddings to a local IVF index.")
+    parser.add_argument("--model", choices=list(EMBEDDING_DIMENSIONS), action="append",
+                        help="model to export (repeatable); defaults to all")
+    parser.add_argument("--out-dir", default=ANN_INDEX_DIR)
+    parser.add_argument("--lists", type=int, default=None, help="number of IVF lists (default sqrt(N))")
+    args = parser.parse_args()
+
+    for model_choice in args.model or EMBEDDING_DIMENSIONS:
+        export_ann_index(driver, model_choice, out_dir=args.out_dir, n_lists=args.lists)
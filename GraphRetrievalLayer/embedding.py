@@ -1,9 +1,23 @@
+import argparse
+import hashlib
+import math
+import multiprocessing
 import os
-from sentence_transformers import SentenceTransformer
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 from neo4j import GraphDatabase
-from InputPreprocessing.intent_classifier import classify_intent, classify_intent_llm
-from InputPreprocessing.entity_extractions import extract_entities, extract_entities_with_llm
-from InputPreprocessing.input_embedding import embed_user_query
+from dotenv import load_dotenv
+
+# Before the imports below read their settings (EMBEDDING_STORAGE, ...) from
+# the environment; also runs in the spawned workers, which re-import this module
+load_dotenv()
+
+from InputPreprocessing.input_embedding import embed_user_query, get_model, MODEL_NAMES
+from GraphRetrievalLayer.schema import search_key, vector_index_name, EMBEDDED_LABELS, EMBEDDING_STORAGE
+from GraphRetrievalLayer.ann_index import AnnIndex
+from GraphRetrievalLayer.result_cache import cached_result
+from GraphRetrievalLayer.entity_resolution import get_gazetteer, resolve_entities
 
 
 URI = os.getenv("URI")
@@ -14,14 +28,23 @@ driver = GraphDatabase.driver(URI, auth=(USERNAME, PASSWORD))
 
 
 
-# Two embedding models (Requirement 1)
-MODEL_MINILM = "sentence-transformers/all-MiniLM-L6-v2"
-MODEL_MPNET = "sentence-transformers/all-mpnet-base-v2"
+# Two embedding models (Requirement 1), loaded on first use from the shared
+# registry in InputPreprocessing.input_embedding.
+# EMBEDDING_MODELS picks which of them the embedding job stores on the nodes.
+EMBEDDING_MODELS = [m.strip() for m in os.getenv("EMBEDDING_MODELS", ",".join(MODEL_NAMES)).split(",") if m.strip()]
 
-models = {
-    "minilm": SentenceTransformer(MODEL_MINILM),
-    "mpnet": SentenceTransformer(MODEL_MPNET)
-}
+# The vector indexes and the full scan skip byte properties, so float16
+# vectors are only searchable once the ANN index has been exported
+FLOAT16_NEEDS_ANN_INDEX = (
+    "EMBEDDING_STORAGE=float16 stores the vectors as bytes, which only the local ANN index can "
+    "search. Export it with: python -m GraphRetrievalLayer.ann_index --model {model}"
+)
+
+# Without stored vectors every search path silently returns nothing
+NO_STORED_VECTORS = (
+    "No node has an embedding_{model} vector. Add {model} to EMBEDDING_MODELS and run: "
+    "python -m GraphRetrievalLayer.embedding"
+)
 
 
 def build_node_text(label: str, props: dict):
@@ -47,392 +70,778 @@ def build_node_text(label: str, props: dict):
     return ""
 
 
-def create_all_node_embeddings():
+# Write-side queries of the embedding job (no _QUERY suffix, so the index
+# report in schema.py only lists retrieval queries).
+# Node texts are built from the properties; the stored vectors are left out.
+# Only nodes with one of $labels (EMBEDDED_LABELS) leave the server, so the
+# derived PlayerForm/PlayerSeasonStats nodes are never streamed.
+# $label / $season narrow the job to one label or to the nodes of one season
+# (players and teams by the fixtures they appear in).
+EMBEDDING_NODES = """
+MATCH (n)
+WHERE any(l IN labels(n) WHERE l IN $labels)
+  AND ($label IS NULL OR $label IN labels(n))
+  AND ($season IS NULL
+       OR n.season = $season
+       OR n.season_name = $season
+       OR EXISTS { (n)-[:PLAYED_IN]->(:Fixture {season: $season}) }
+       OR EXISTS { (n)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(:Fixture {season: $season}) })
+RETURN elementId(n) AS id, labels(n)[0] AS label,
+       n {.*, embedding_minilm: null, embedding_mpnet: null} AS props,
+       [m IN $models WHERE n['embedding_' + m] IS NOT NULL] AS embedded
+"""
+
+# The hash of the text each vector was computed from is stored next to it
+EMBEDDING_WRITE = {
+    "float64": """
+UNWIND $rows AS row
+MATCH (n) WHERE elementId(n) = row.id
+SET n.{property} = row.vector,
+    n.{property}_text_hash = row.text_hash
+""",
+    "float32": """
+UNWIND $rows AS row
+MATCH (n) WHERE elementId(n) = row.id
+CALL db.create.setNodeVectorProperty(n, '{property}', row.vector)
+SET n.{property}_text_hash = row.text_hash
+""",
+}
+EMBEDDING_WRITE["float16"] = EMBEDDING_WRITE["float64"]
+
+# Drops the vectors of models that are no longer configured
+EMBEDDING_PRUNE = """
+MATCH (n) WHERE n.{property} IS NOT NULL
+CALL {{
+    WITH n
+    REMOVE n.{property}, n.{property}_text_hash
+}} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+def encode_for_storage(vector, storage: str = EMBEDDING_STORAGE):
     """
-    Create embeddings for every node in the Neo4j KG using BOTH models.
-    Stores:
-        n.embedding_minilm
-        n.embedding_mpnet
+    Converts a model output vector into the property value written for `storage`.
     """
+    if storage == "float16":
+        return np.asarray(vector, dtype="<f2").tobytes()
+    return vector.tolist()
+
+
+def text_hash(text: str):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def embed_and_write(model_name: str, pending: list, batch_size: int, encode_batch_size: int, tag: str = None):
+    """
+    Encodes (elementId, text, text hash) tuples with `model_name` and writes
+    the vectors back, one UNWIND transaction per `batch_size` nodes.
+    Returns the number of nodes written.
+    """
+    tag = tag or model_name
+    model = get_model(model_name)
+    cypher = EMBEDDING_WRITE[EMBEDDING_STORAGE].format(property=f"embedding_{model_name}")
+    start = time.time()
+    done = 0
+
     with driver.session() as session:
-        results = session.run("""
-            MATCH (n)
-            RETURN id(n) AS id, labels(n)[0] AS label, properties(n) AS props
-        """)
-
-        for record in results:
-            node_id = record["id"]
-            label   = record["label"]
-            props   = record["props"]
-
-            text_description = build_node_text(label, props)
-
-            for model_name, model in models.items():
-                vector = model.encode(text_description).tolist()
-
-                session.run(
-                    f"""
-                    MATCH (n) WHERE id(n) = $id
-                    SET n.embedding_{model_name} = $vector
-                    """,
-                    id=node_id,
-                    vector=vector
-                )
+        for i in range(0, len(pending), batch_size):
+            batch = pending[i:i + batch_size]
+            vectors = model.encode([text for _, text, _ in batch], batch_size=encode_batch_size)
+            rows = [{"id": node_id, "vector": encode_for_storage(vector), "text_hash": digest}
+                    for (node_id, _, digest), vector in zip(batch, vectors)]
+            session.execute_write(lambda tx: tx.run(cypher, rows=rows).consume())
+
+            done += len(batch)
+            elapsed = time.time() - start
+            print(f"[{tag}] {done}/{len(pending)} nodes "
+                  f"({done / elapsed if elapsed else 0:.0f} nodes/sec)", flush=True)
+    return done
 
-    print("All node embeddings created and stored successfully!")
 
+def _init_embedding_worker(threads: int):
+    # Split the cores between the workers instead of every worker using all of them
+    import torch
+    torch.set_num_threads(threads)
 
 
-def semantic_search(query: list, model_choice: str = "mpnet", limit: int = 5):
+def embed_sharded(model_name: str, pending: list, workers: int, batch_size: int, encode_batch_size: int):
     """
-    Generic semantic search over ALL nodes in the KG.
+    Splits `pending` into `workers` contiguous elementId ranges and embeds them
+    in a process pool. Each worker loads its own model and driver and commits
+    its own batches, so a failed shard keeps everything it already wrote and
+    the next run (which skips nodes with an up-to-date text hash) resumes it.
+    Spawned workers re-import this module, so it must not import spaCy, the
+    Gemini clients or anything else that does work at import time.
     """
-    query_vec = embed_user_query(query, model_choice)
+    pending = sorted(pending)
+    shard_size = math.ceil(len(pending) / workers)
+    shards = [pending[i:i + shard_size] for i in range(0, len(pending), shard_size)]
+    threads = max(1, (os.cpu_count() or 1) // len(shards))
+
+    done = 0
+    failed = []
+    # spawn: workers must not share the parent's driver sockets or model
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context,
+                             initializer=_init_embedding_worker, initargs=(threads,)) as pool:
+        futures = {
+            pool.submit(embed_and_write, model_name, shard, batch_size, encode_batch_size,
+                        f"{model_name} shard {i + 1}/{len(shards)}"): (i, shard)
+            for i, shard in enumerate(shards)
+        }
+        for future in as_completed(futures):
+            i, shard = futures[future]
+            try:
+                done += future.result()
+            except Exception as e:
+                failed.append(i + 1)
+                print(f"[{model_name}] shard {i + 1}/{len(shards)} "
+                      f"({shard[0][0]} .. {shard[-1][0]}) failed: {e}")
+
+    if failed:
+        print(f"[{model_name}] shards {failed} failed; run the job again to resume them")
+    return done
+
+
+def create_all_node_embeddings(batch_size: int = 512, encode_batch_size: int = 64,
+                               label: str = None, season: str = None, force: bool = False,
+                               prune: bool = False, workers: int = 1):
+    """
+    Create embeddings for every node in the Neo4j KG using the EMBEDDING_MODELS
+    models (both by default). Stores, in EMBEDDING_STORAGE format:
+        n.embedding_minilm (+ n.embedding_minilm_text_hash)
+        n.embedding_mpnet (+ n.embedding_mpnet_text_hash)
+    Only nodes without a vector or whose build_node_text output changed since
+    the last run are encoded, unless `force` is set. `label` and `season`
+    restrict the job to part of the graph. `prune` removes the vectors of
+    models that are not configured. With `workers` > 1 the nodes are sharded
+    across a process pool (see embed_sharded).
+    Texts are encoded `batch_size` nodes at a time and written back with one
+    UNWIND per batch.
+    """
+    if prune:
+        with driver.session() as session:
+            for model_name in MODEL_NAMES:
+                if model_name not in EMBEDDING_MODELS:
+                    session.run(EMBEDDING_PRUNE.format(property=f"embedding_{model_name}")).consume()
+                    print(f"Removed embedding_{model_name} vectors")
 
-    embedding_property = f"embedding_{model_choice}"
+    with driver.session() as session:
+        records = session.run(EMBEDDING_NODES, labels=EMBEDDED_LABELS, label=label, season=season,
+                              models=EMBEDDING_MODELS)
+        nodes = [(r["id"], build_node_text(r["label"], r["props"]), r["props"], r["embedded"]) for r in records]
+
+    # A node whose properties give no text (build_node_text) stays out of semantic search
+    nodes = [node for node in nodes if node[1]]
+
+    for model_name in EMBEDDING_MODELS:
+        property_name = f"embedding_{model_name}"
+        pending = []
+        for node_id, text, props, embedded in nodes:
+            digest = text_hash(text)
+            if force or model_name not in embedded or props.get(f"{property_name}_text_hash") != digest:
+                pending.append((node_id, text, digest))
+        print(f"[{model_name}] {len(pending)} of {len(nodes)} nodes need embedding")
+
+        if not pending:
+            continue
+
+        start = time.time()
+        if workers > 1:
+            done = embed_sharded(model_name, pending, workers, batch_size, encode_batch_size)
+        else:
+            done = embed_and_write(model_name, pending, batch_size, encode_batch_size)
+        elapsed = time.time() - start
+        print(f"[{model_name}] embedded {done} nodes in {elapsed:.1f}s "
+              f"({done / elapsed if elapsed else 0:.0f} nodes/sec, workers={workers})")
+        if EMBEDDING_STORAGE == "float16" and AnnIndex.exists(model_name):
+            print(f"[{model_name}] re-export the ANN index to pick up the new vectors")
+
+    print("All node embeddings created and stored successfully!")
 
-    cypher = f"""
-    WITH $query_vec AS qvec
-    MATCH (n)
+    # The ANN index is exported from the stored vectors, so a first float16
+    # run cannot have one yet
+    if EMBEDDING_STORAGE == "float16":
+        missing = [m for m in EMBEDDING_MODELS if not AnnIndex.exists(m)]
+        if missing:
+            print("Warning: " + FLOAT16_NEEDS_ANN_INDEX.format(model=" --model ".join(missing)))
+
+
+
+# Properties semantic search returns for a node. Listed explicitly so the
+# embeddings and their text hashes never leave the database.
+NODE_PROJECTION = """n {.season_name, .season, .GW_number, .fixture_number, .kickoff_time,
+       .name, .player_name, .player_element}"""
+
+# Approximate top-k per label from the vector indexes. The index score is
+# (1 + cosine) / 2; it is mapped back so scores match the full scan.
+VECTOR_SEARCH_BRANCH = """
+    CALL db.index.vector.queryNodes('{index}', $limit, $query_vec) YIELD node, score
+    RETURN node AS n, 2 * score - 1 AS similarity_score
+"""
+
+VECTOR_SEARCH = """
+CALL {{
+{branches}
+}}
+WITH n, similarity_score
+ORDER BY similarity_score DESC
+LIMIT $limit
+RETURN labels(n)[0] AS label,
+    elementId(n) AS node_id,
+    {node} AS node,
+    similarity_score
+"""
+
+# Plain scan, used when the vector indexes do not exist
+FULL_SCAN_SEARCH = """
+WITH $query_vec AS qvec
+MATCH ({node_pattern})
+WHERE n.{embedding_property} IS NOT NULL
+WITH n, gds.similarity.cosine(n.{embedding_property}, qvec) AS similarity_score,
+    COALESCE(n.player_name, n.name, n.fixture_number, toString(n.GW_number), n.season_name, elementId(n)) AS unique_id
+ORDER BY similarity_score DESC
+WITH unique_id, n, max(similarity_score) AS similarity_score  // keep top similarity per unique node
+RETURN labels(n)[0] AS label,
+    elementId(n) AS node_id,
+    {node} AS node,
+    similarity_score
+ORDER BY similarity_score DESC
+LIMIT $limit
+"""
+
+# Properties of the nodes picked by the local ANN index
+FETCH_NODES = """
+UNWIND $hits AS hit
+MATCH (n) WHERE elementId(n) = hit.id
+RETURN labels(n)[0] AS label,
+    elementId(n) AS node_id,
+    """ + NODE_PROJECTION + """ AS node,
+    hit.score AS similarity_score
+ORDER BY similarity_score DESC
+"""
+
+# model_choice -> whether all its vector indexes exist (checked once per process)
+vector_indexes_online = {}
+
+# model_choice -> AnnIndex, or None when no local index was exported
+ann_indexes = {}
+
+# Models known to have vectors on the nodes (a miss is re-checked, so vectors
+# written after startup are picked up)
+models_with_vectors = set()
+
+STORED_VECTORS_EXIST = """
+RETURN EXISTS {{
+    MATCH (n:{labels})
     WHERE n.{embedding_property} IS NOT NULL
-    WITH n, gds.similarity.cosine(n.{embedding_property}, qvec) AS similarity_score,
-        COALESCE(n.player_name, n.name, n.fixture_number, toString(n.GW_number), n.season_name, elementId(n)) AS unique_id
-    ORDER BY similarity_score DESC
-    WITH unique_id, n, max(similarity_score) AS similarity_score  // keep top similarity per unique node
-    RETURN labels(n)[0] AS label,
-        elementId(n) AS node_id,
-        apoc.map.removeKeys(n, ["embedding_mpnet", "embedding_minilm"]) AS node,
-        similarity_score
-    ORDER BY similarity_score DESC
-    LIMIT $limit
+}} AS stored
+"""
+
+
+def get_ann_index(model_choice: str):
+    if model_choice not in ann_indexes:
+        ann_indexes[model_choice] = AnnIndex(model_choice) if AnnIndex.exists(model_choice) else None
+    return ann_indexes[model_choice]
+
+
+def has_vector_indexes(session, model_choice: str):
+    if model_choice not in vector_indexes_online:
+        expected = {vector_index_name(label, model_choice) for label in EMBEDDED_LABELS}
+        online = {
+            r["name"] for r in session.run(
+                "SHOW VECTOR INDEXES YIELD name, state WHERE state = 'ONLINE' RETURN name"
+            )
+        }
+        vector_indexes_online[model_choice] = expected <= online
+    return vector_indexes_online[model_choice]
+
+
+def has_stored_vectors(session, model_choice: str):
+    if model_choice not in models_with_vectors:
+        cypher = STORED_VECTORS_EXIST.format(labels="|".join(EMBEDDED_LABELS),
+                                             embedding_property=f"embedding_{model_choice}")
+        if session.run(cypher).single()["stored"]:
+            models_with_vectors.add(model_choice)
+    return model_choice in models_with_vectors
+
+
+def semantic_search(query: list, model_choice: str = "mpnet", limit: int = 5, labels: list = None):
+    """
+    Generic semantic search over ALL nodes in the KG, or only over the nodes
+    with one of `labels`.
+    Answers from the local ANN index when one was exported (only the winning
+    nodes are fetched), else from the per-label vector indexes, else scans
+    every node. float16 storage requires the ANN index, and a model with no
+    stored vectors raises instead of returning nothing.
     """
+    query_vec = embed_user_query(query, model_choice)
+    search_labels = [label for label in EMBEDDED_LABELS if labels is None or label in labels]
+    if not search_labels:
+        return []
+
+    ann_index = get_ann_index(model_choice)
+    if ann_index is None and EMBEDDING_STORAGE == "float16":
+        raise RuntimeError(FLOAT16_NEEDS_ANN_INDEX.format(model=model_choice))
+    if ann_index is not None:
+        hits = [{"id": node_id, "score": score}
+                for node_id, _, score in ann_index.search(query_vec, k=limit, labels=labels)]
+        with driver.session() as session:
+            return [record.data() for record in session.run(FETCH_NODES, hits=hits)]
 
     with driver.session() as session:
+        if not has_stored_vectors(session, model_choice):
+            raise RuntimeError(NO_STORED_VECTORS.format(model=model_choice))
+        if has_vector_indexes(session, model_choice):
+            branches = "\n    UNION ALL\n".join(
+                VECTOR_SEARCH_BRANCH.format(index=vector_index_name(label, model_choice))
+                for label in search_labels
+            )
+            cypher = VECTOR_SEARCH.format(branches=branches, node=NODE_PROJECTION)
+        else:
+            node_pattern = "n" if labels is None else "n:" + "|".join(search_labels)
+            cypher = FULL_SCAN_SEARCH.format(embedding_property=f"embedding_{model_choice}",
+                                             node_pattern=node_pattern, node=NODE_PROJECTION)
+
         results = session.run(cypher, query_vec=query_vec, limit=limit)
         return [record.data() for record in results]
 
 
+#--------------------------------------------
+# Composite helper queries
+#--------------------------------------------
+# Each cypher_* helper runs one query: every section is a CALL subquery that
+# aggregates to exactly one row (a collected list, or the first row via
+# head(), null when nothing matched), so the sections combine into one
+# record and one round trip. Results are cached per arguments and KG version
+# (result_cache.py).
+
+PLAYER_STATS_QUERY = """
+UNWIND $players AS player
+
+// Season check: fall back to the player's most recent season when the
+// requested one has no data
+CALL {
+    WITH player
+    OPTIONAL MATCH (:Player {player_name: player.name})-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
+    WITH ps ORDER BY ps.season DESC
+    WITH collect(ps.season) AS seasons
+    WITH seasons, $season IS NOT NULL AND size(seasons) > 0 AND NOT $season IN seasons AS fell_back
+    RETURN size(seasons) AS season_count,
+           fell_back,
+           CASE WHEN fell_back THEN seasons[0] ELSE $season END AS season
+}
+
+// 1. Detailed Season Overview
+CALL {
+    WITH player, season
+    MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
+    WHERE p.search_name = player.key
+      AND (season IS NULL OR ps.season = season)
+    WITH p.player_name AS player,
+         ps.season AS season,
+         sum(ps.minutes) AS minutes,
+         sum(ps.goals_scored) AS goals,
+         sum(ps.assists) AS assists,
+         sum(ps.clean_sheets) AS clean_sheets,
+         sum(ps.total_points) AS total_points,
+         sum(ps.bonus) AS total_bonus
+    RETURN head(collect({player: player, season: season, minutes: minutes, goals: goals, assists: assists,
+                         clean_sheets: clean_sheets, total_points: total_points,
+                         total_bonus: total_bonus})) AS season_overview
+}
+
+// 2. Recent Form (Last 5 Gameweeks Played)
+CALL {
+    WITH player, season
+    MATCH (p:Player)-[:HAS_FORM]->(pf:PlayerForm)
+    WHERE p.search_name = player.key
+      AND CASE WHEN season IS NULL THEN pf.latest
+               ELSE pf.season_latest AND pf.season = season END
+    RETURN head(collect({player: p.player_name,
+                         recent_gameweeks: pf.recent_gameweeks,
+                         recent_points: pf.recent_points,
+                         avg_ict_form: pf.ict_5})) AS recent_form
+}
+
+// 3. Efficiency (Points per 90)
+CALL {
+    WITH player
+    MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
+    WHERE p.search_name = player.key
+    WITH p, sum(ps.total_points) as pts, sum(ps.minutes) as mins
+    WHERE mins > 0
+    RETURN head(collect({player: p.player_name,
+                         points_per_90: toFloat(pts) / mins * 90})) AS efficiency
+}
+
+RETURN player.name AS name, season_count, fell_back, season, season_overview, recent_form, efficiency
+"""
+
+
+@cached_result(driver)
+def cypher_player_stats_batch(names: list, season: str = None):
+    """
+    cypher_player_stats for several players in one round trip.
+    Returns {name: results}.
+    """
+    players = [{"name": name, "key": search_key(name)} for name in dict.fromkeys(names)]
+    if not players:
+        return {}
+
+    with driver.session() as session:
+        records = list(session.run(PLAYER_STATS_QUERY, players=players, season=season))
+
+    stats = {}
+    for record in records:
+        name = record['name']
+        # No data for the requested season and no other season to fall back to
+        if season and record['season_count'] == 0:
+            stats[name] = {'error': f'No data found for player {name}'}
+            continue
+
+        results = {}
+        if record['fell_back']:
+            results['note'] = f"No data for requested season. Showing data for {record['season']}"
 
+        results['season_overview'] = record['season_overview']
+        results['recent_form'] = record['recent_form']
+        results['efficiency'] = record['efficiency']
+        stats[name] = results
+
+    return stats
 
 
 def cypher_player_stats(name: str, season: str = None):
     """
     Returns multiple perspectives on player statistics
-    Updated with new queries using CONTAINS for flexible matching
+    Seasons and names are matched exactly (see entity_resolution.resolve_entities)
     """
-    results = {}
-    
-    with driver.session() as session:
-        # First check if player has data for the specified season
-        if season:
-            check_result = session.run("""
-                MATCH (p:Player {player_name: $player_name})-[r:PLAYED_IN]->(f:Fixture)
-                MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season {season_name: $season})
-                RETURN count(r) as match_count
-            """, player_name=name, season=season)
-            
-            match_count = check_result.single()['match_count']
-            
-            # If no data for specified season, fall back to most recent season
-            if match_count == 0:
-                fallback_result = session.run("""
-                    MATCH (p:Player {player_name: $player_name})-[r:PLAYED_IN]->(f:Fixture)
-                    MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-                    RETURN s.season_name as available_season
-                    ORDER BY s.season_name DESC
-                    LIMIT 1
-                """, player_name=name)
-                
-                fallback = fallback_result.single()
-                if fallback:
-                    season = fallback['available_season']
-                    results['note'] = f"No data for requested season. Showing data for {season}"
-                else:
-                    return {'error': f'No data found for player {name}'}
-        
-        # 1. Detailed Season Overview
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            WHERE ($player_name IS NULL OR toLower(p.player_name) CONTAINS toLower($player_name))
-              AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            RETURN p.player_name AS player, 
-                   s.season_name AS season,
-                   sum(r.minutes) AS minutes,
-                   sum(r.goals_scored) AS goals, 
-                   sum(r.assists) AS assists, 
-                   sum(r.clean_sheets) AS clean_sheets,
-                   sum(r.total_points) AS total_points,
-                   sum(r.bonus) AS total_bonus
-        """, player_name=name, season=season)
-        results['season_overview'] = result.single().data() if result.peek() else None
-        
-        # 2. Recent Form (Last 5 Games Played)
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            WHERE ($player_name IS NULL OR toLower(p.player_name) CONTAINS toLower($player_name))
-              AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            WITH p, r, gw ORDER BY gw.GW_number DESC LIMIT 5
-            RETURN p.player_name AS player, 
-                   collect(gw.GW_number) as recent_gameweeks,
-                   collect(r.total_points) as recent_points,
-                   avg(r.ict_index) as avg_ict_form
-        """, player_name=name, season=season)
-        results['recent_form'] = result.single().data() if result.peek() else None
-        
-        # 3. Efficiency (Points per 90)
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            WHERE ($player_name IS NULL OR toLower(p.player_name) CONTAINS toLower($player_name))
-            WITH p, sum(r.total_points) as pts, sum(r.minutes) as mins
-            WHERE mins > 0
-            RETURN p.player_name AS player, 
-                   (toFloat(pts) / mins * 90) AS points_per_90
-        """, player_name=name)
-        results['efficiency'] = result.single().data() if result.peek() else None
-    
-    return results
+    return cypher_player_stats_batch([name], season)[name]
+
+
+TOP_PLAYERS_QUERY = """
+// 1. Top Point Scorers
+CALL {
+    MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
+    MATCH (p)-[:PLAYS_AS]->(pos:Position)
+    WHERE ($position IS NULL OR toLower(pos.name) CONTAINS toLower($position))
+      AND ($season IS NULL OR ps.season = $season)
+    WITH p.player_name AS player, pos.name AS position, sum(ps.total_points) AS total_points
+    ORDER BY total_points DESC
+    LIMIT 10
+    RETURN collect({player: player, position: position, total_points: total_points}) AS top_points
+}
 
+// 2. Golden Boot (Goals)
+CALL {
+    MATCH (ps:PlayerSeasonStats)
+    WHERE ($season IS NULL OR ps.season = $season)
+    WITH ps.player_name AS player, sum(ps.goals_scored) AS goals
+    ORDER BY goals DESC
+    LIMIT 5
+    RETURN collect({player: player, goals: goals}) AS top_scorers
+}
 
+// 3. Top Playmakers (Assists)
+CALL {
+    MATCH (ps:PlayerSeasonStats)
+    WHERE ($season IS NULL OR ps.season = $season)
+    WITH ps.player_name AS player, sum(ps.assists) AS assists, sum(ps.ict_index) as creativity_score
+    ORDER BY assists DESC
+    LIMIT 5
+    RETURN collect({player: player, assists: assists, creativity_score: creativity_score}) AS top_playmakers
+}
+
+// 4. Top Defenders
+CALL {
+    MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
+    MATCH (p)-[:PLAYS_AS]->(pos:Position)
+    WHERE pos.name IN ['DEF', 'GK']
+      AND ($season IS NULL OR ps.season = $season)
+    WITH p.player_name AS player,
+         sum(ps.clean_sheets) AS clean_sheets,
+         sum(ps.goals_conceded) as goals_conceded,
+         sum(ps.total_points) as total_points
+    ORDER BY clean_sheets DESC, total_points DESC
+    LIMIT 5
+    RETURN collect({player: player, clean_sheets: clean_sheets, goals_conceded: goals_conceded,
+                    total_points: total_points}) AS top_defenders
+}
+
+RETURN top_points, top_scorers, top_playmakers, top_defenders
+"""
+
+
+@cached_result(driver)
 def cypher_top_scorers(season: str = None, position: str = None):
     """
     Returns multiple top player rankings
-    Updated with new queries using CONTAINS for flexible matching
+    Seasons and names are matched exactly (see entity_resolution.resolve_entities)
     """
-    results = {}
-    
     with driver.session() as session:
-        # 1. Top Point Scorers
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (p)-[:PLAYS_AS]->(pos:Position)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            WHERE ($position IS NULL OR toLower(pos.name) CONTAINS toLower($position))
-              AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            RETURN p.player_name AS player, pos.name AS position, sum(r.total_points) AS total_points
-            ORDER BY total_points DESC
-            LIMIT 10
-        """, position=position, season=season)
-        results['top_points'] = [r.data() for r in result]
-        
-        # 2. Golden Boot (Goals)
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            WHERE ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            RETURN p.player_name AS player, sum(r.goals_scored) AS goals
-            ORDER BY goals DESC
-            LIMIT 5
-        """, season=season)
-        results['top_scorers'] = [r.data() for r in result]
-        
-        # 3. Top Playmakers (Assists)
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            WHERE ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            RETURN p.player_name AS player, sum(r.assists) AS assists, sum(r.ict_index) as creativity_score
-            ORDER BY assists DESC
-            LIMIT 5
-        """, season=season)
-        results['top_playmakers'] = [r.data() for r in result]
-        
-        # 4. Top Defenders
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (p)-[:PLAYS_AS]->(pos:Position)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            WHERE pos.name IN ['DEF', 'GK']
-              AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            RETURN p.player_name AS player, 
-                   sum(r.clean_sheets) AS clean_sheets, 
-                   sum(r.goals_conceded) as goals_conceded,
-                   sum(r.total_points) as total_points
-            ORDER BY clean_sheets DESC, total_points DESC
-            LIMIT 5
-        """, season=season)
-        results['top_defenders'] = [r.data() for r in result]
+        record = session.run(TOP_PLAYERS_QUERY, position=position, season=season).single()
     
-    return results
+    return record.data()
+
+
+FIXTURE_INFO_QUERY = """
+// 1. Upcoming Fixtures for Team
+CALL {
+    MATCH (t:Team)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
+    WHERE t.search_name = $team_key
+      AND f.kickoff_time >= datetime()
+    WITH f, t
+    MATCH (f)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(opponent:Team)
+    WHERE opponent <> t
+    WITH f, t, opponent
+    ORDER BY f.kickoff_time ASC
+    LIMIT 3
+    RETURN collect({kickoff: f.kickoff_time, team: t.name, opponent: opponent.name}) AS upcoming_fixtures
+}
+
+// 2. Specific Fixture Info, per requested fixture number
+UNWIND $fixtures AS fix
+CALL {
+    WITH fix
+    MATCH (f:Fixture {fixture_number: fix})
+    WHERE ($season IS NULL OR f.season = $season)
+    MATCH (f)-[:HAS_HOME_TEAM]->(home:Team)
+    MATCH (f)-[:HAS_AWAY_TEAM]->(away:Team)
+    RETURN head(collect({kickoff: f.kickoff_time, home_team: home.name, away_team: away.name,
+                         season: f.season})) AS fixture_details
+}
+
+RETURN fix, upcoming_fixtures, fixture_details
+"""
+
+
+@cached_result(driver)
+def cypher_fixture_info_batch(fixture_numbers: list, season: str = None, team: str = None):
+    """
+    cypher_fixture_info for several fixture numbers in one round trip; the
+    upcoming fixtures of `team` are the same for all of them.
+    Returns {fixture_number: results}.
+    """
+    fixtures = list(dict.fromkeys(fixture_numbers))
+    with driver.session() as session:
+        records = list(session.run(FIXTURE_INFO_QUERY, team_key=search_key(team),
+                                   fixtures=fixtures, season=season))
+
+    info = {}
+    for record in records:
+        results = {'upcoming_fixtures': record['upcoming_fixtures']}
+        if record['fix']:
+            results['fixture_details'] = record['fixture_details']
+        info[record['fix']] = results
+    return info
 
 
 def cypher_fixture_info(fixture_number: int = None, season: str = None, team: str = None, player_name: str = None):
     """
     Returns fixture information and upcoming schedule
-    Updated with new queries using CONTAINS for flexible matching
+    Seasons and names are matched exactly (see entity_resolution.resolve_entities)
     """
-    results = {}
-    
-    with driver.session() as session:
-        # 1. Upcoming Fixtures for Team
-        result = session.run("""
-            MATCH (t:Team)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-            WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
-              AND f.kickoff_time >= datetime() 
-            WITH f, t
-            MATCH (f)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(opponent:Team)
-            WHERE opponent <> t
-            RETURN f.kickoff_time AS kickoff, 
-                   t.name AS team, 
-                   opponent.name AS opponent
-            ORDER BY f.kickoff_time ASC
-            LIMIT 3
-        """, team=team)
-        results['upcoming_fixtures'] = [r.data() for r in result]
-        
-        # 2. Specific Fixture Info (if fixture_number provided)
-        if fixture_number:
-            result = session.run("""
-                MATCH (f:Fixture {fixture_number: $fix})
-                WHERE ($season IS NULL OR f.season = $season)
-                MATCH (f)-[:HAS_HOME_TEAM]->(home:Team)
-                MATCH (f)-[:HAS_AWAY_TEAM]->(away:Team)
-                RETURN f.kickoff_time AS kickoff,
-                       home.name AS home_team,
-                       away.name AS away_team,
-                       f.season AS season
-            """, fix=fixture_number, season=season)
-            results['fixture_details'] = result.single().data() if result.peek() else None
-    
-    return results
+    return cypher_fixture_info_batch([fixture_number], season, team)[fixture_number]
+
+
+TEAM_ANALYSIS_QUERY = """
+// Squads come from the season-scoped PLAYS_FOR edges; only fixtures the
+// player's own team played in that season are counted.
+
+UNWIND $teams AS team
+
+// 1. Best Attackers (Goals/Assists by the team's own squad)
+CALL {
+    WITH team
+    MATCH (t:Team)<-[pf:PLAYS_FOR]-(p:Player)-[:PLAYS_AS]->(pos:Position)
+    WHERE t.search_name = team.key
+      AND pos.name IN ['FWD', 'MID']
+    MATCH (p)-[r:PLAYED_IN]->(f:Fixture)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]->(t)
+    WHERE f.season = pf.season
+    WITH p.player_name AS player,
+         sum(r.goals_scored) AS goals,
+         sum(r.assists) AS assists,
+         sum(r.total_points) as points
+    ORDER BY points DESC
+    LIMIT 5
+    RETURN collect({player: player, goals: goals, assists: assists, points: points}) AS top_attackers
+}
 
+// 2. Team Defensive Overview (Clean Sheets of the team's defenders)
+CALL {
+    WITH team
+    MATCH (t:Team)<-[pf:PLAYS_FOR]-(p:Player)-[:PLAYS_AS]->(pos:Position)
+    WHERE t.search_name = team.key
+      AND pos.name IN ['DEF', 'GK']
+    MATCH (p)-[r:PLAYED_IN]->(f:Fixture)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]->(t)
+    WHERE f.season = pf.season
+    WITH t.name AS team_name,
+         sum(r.clean_sheets) AS total_clean_sheets,
+         sum(r.goals_conceded) AS total_goals_conceded
+    RETURN head(collect({team: team_name, total_clean_sheets: total_clean_sheets,
+                         total_goals_conceded: total_goals_conceded})) AS defensive_overview
+}
 
-def cypher_team_analysis(team_name: str, season: str = None):
+// 3. Best players by total points
+CALL {
+    WITH team
+    MATCH (t:Team)<-[pf:PLAYS_FOR]-(p:Player)
+    WHERE t.search_name = team.key
+      AND ($season IS NULL OR pf.season = $season)
+    MATCH (p)-[r:PLAYED_IN]->(f:Fixture)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]->(t)
+    WHERE f.season = pf.season
+    WITH p.player_name AS player,
+         pf.season AS season,
+         sum(r.minutes) AS minutes,
+         sum(r.goals_scored) AS goals,
+         sum(r.assists) AS assists,
+         sum(r.clean_sheets) AS clean_sheets,
+         sum(r.total_points) AS total_points,
+         sum(r.bonus) AS total_bonus
+    ORDER BY total_points DESC
+    LIMIT 5
+    RETURN collect({player: player, season: season, minutes: minutes, goals: goals, assists: assists,
+                    clean_sheets: clean_sheets, total_points: total_points,
+                    total_bonus: total_bonus}) AS best_players
+}
+
+// 4. Overall Team Performance (Aggregated Stats)
+CALL {
+    WITH team
+    MATCH (t:Team)<-[pf:PLAYS_FOR]-(p:Player)
+    WHERE t.search_name = team.key
+      AND ($season IS NULL OR pf.season = $season)
+    MATCH (p)-[r:PLAYED_IN]->(f:Fixture)-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]->(t)
+    WHERE f.season = pf.season
+    WITH t.name AS team_name,
+         pf.season AS season,
+         count(DISTINCT f) AS games_played,
+         sum(r.goals_scored) AS total_goals,
+         sum(r.assists) AS total_assists,
+         sum(r.clean_sheets) AS total_clean_sheets,
+         sum(r.total_points) AS total_points,
+         avg(r.total_points) AS avg_points_per_game
+    RETURN head(collect({team: team_name, season: season, games_played: games_played, total_goals: total_goals,
+                         total_assists: total_assists, total_clean_sheets: total_clean_sheets,
+                         total_points: total_points,
+                         avg_points_per_game: avg_points_per_game})) AS team_overview
+}
+
+RETURN team.name AS name, top_attackers, defensive_overview, best_players, team_overview
+"""
+
+
+@cached_result(driver)
+def cypher_team_analysis_batch(team_names: list, season: str = None):
     """
-    Returns comprehensive team analysis
-    Updated with new queries using CONTAINS for flexible matching
+    cypher_team_analysis for several teams in one round trip.
+    Returns {team_name: results}.
     """
-    results = {}
-    
     if season:
         season = season.replace("/", "-").strip()
 
+    teams = [{"name": name, "key": search_key(name)} for name in dict.fromkeys(team_names)]
+    if not teams:
+        return {}
+
     with driver.session() as session:
-        # 1. Best Attackers (Goals/Assists in games involving this team)
-        result = session.run("""
-            MATCH (t:Team)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-            MATCH (p:Player)-[r:PLAYED_IN]->(f)
-            MATCH (p)-[:PLAYS_AS]->(pos:Position)
-            WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
-                AND pos.name IN ['FW', 'MID']
-            RETURN p.player_name AS player, 
-                   sum(r.goals_scored) AS goals, 
-                   sum(r.assists) AS assists, 
-                   sum(r.total_points) as points
-            ORDER BY points DESC
-            LIMIT 5
-        """, team=team_name)
-        results['top_attackers'] = [r.data() for r in result]
-
-        # 2. Team Defensive Overview (via Clean Sheets in team games)
-        result = session.run("""
-            MATCH (t:Team)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-            MATCH (p:Player)-[r:PLAYED_IN]->(f)
-            MATCH (p)-[:PLAYS_AS]->(pos:Position)
-            WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
-              AND pos.name IN ['DEF', 'GK']
-            RETURN t.name AS team, 
-                   sum(r.clean_sheets) AS total_clean_sheets, 
-                   sum(r.goals_conceded) AS total_goals_conceded
-        """, team=team_name)
-        results['defensive_overview'] = result.single().data() if result.peek() else None
-
-        # 3. Best players by total points
-        result = session.run("""
-            MATCH (t:Team)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-            MATCH (p:Player)-[r:PLAYED_IN]->(f)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
-              AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            RETURN p.player_name AS player, 
-                   s.season_name AS season,
-                   sum(r.minutes) AS minutes,
-                   sum(r.goals_scored) AS goals, 
-                   sum(r.assists) AS assists, 
-                   sum(r.clean_sheets) AS clean_sheets,
-                   sum(r.total_points) AS total_points,
-                   sum(r.bonus) AS total_bonus
-            ORDER BY total_points DESC
-            LIMIT 5
-        """, team=team_name, season=season)
-        results['best_players'] = [r.data() for r in result]
-
-        # 4. Overall Team Performance (Aggregated Stats)
-        result = session.run("""
-            MATCH (t:Team)<-[:HAS_HOME_TEAM|HAS_AWAY_TEAM]-(f:Fixture)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            MATCH (p:Player)-[r:PLAYED_IN]->(f)
-            WHERE ($team IS NOT NULL AND toLower(t.name) CONTAINS toLower($team))
-              AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            
-            RETURN t.name AS team,
-                   s.season_name AS season,
-                   count(DISTINCT f) AS games_played,
-                   sum(r.goals_scored) AS total_goals,
-                   sum(r.assists) AS total_assists,
-                   sum(r.clean_sheets) AS total_clean_sheets,
-                   sum(r.total_points) AS total_points,
-                   avg(r.total_points) AS avg_points_per_game
-        """, team=team_name, season=season)
-        results['team_overview'] = result.single().data() if result.peek() else None
-    
-    return results
+        records = list(session.run(TEAM_ANALYSIS_QUERY, teams=teams, season=season))
+
+    analysis = {}
+    for record in records:
+        results = record.data()
+        analysis[results.pop('name')] = results
+    return analysis
 
 
-def cypher_recommend(season: str = None, position: str = None, player_name: str = None, gameweek: str = None):
+def cypher_team_analysis(team_name: str, season: str = None):
+    """
+    Returns comprehensive team analysis
+    Seasons and names are matched exactly (see entity_resolution.resolve_entities)
+    """
+    return cypher_team_analysis_batch([team_name], season)[team_name]
+
+
+RECOMMEND_QUERY = """
+// 1. Value Picks (Points per 90min)
+CALL {
+    MATCH (p:Player)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats)
+    MATCH (p)-[:PLAYS_AS]->(pos:Position)
+    WHERE ($position IS NULL OR toLower(pos.name) CONTAINS toLower($position))
+    WITH p, pos, sum(ps.total_points) as pts, sum(ps.minutes) as mins
+    WHERE mins > 500
+    WITH p.player_name AS player,
+         pos.name AS position,
+         pts AS total_points,
+         (toFloat(pts)/mins * 90) as pts_per_90
+    ORDER BY pts_per_90 DESC
+    LIMIT 5
+    RETURN collect({player: player, position: position, total_points: total_points,
+                    pts_per_90: pts_per_90}) AS value_picks
+}
+
+// 2. Form (Last 3 Gameweeks) at the end of $form_season
+CALL {
+    MATCH (pf:PlayerForm)
+    WHERE pf.season = $form_season AND pf.season_latest = true AND pf.points_3 IS NOT NULL
+    MATCH (p:Player)-[:HAS_FORM]->(pf)
+    WHERE ($player_key IS NULL OR p.search_name = $player_key)
+    WITH p.player_name AS player, pf.points_3 as form_score
+    ORDER BY form_score DESC
+    LIMIT 5
+    RETURN collect({player: player, form_score: form_score}) AS captaincy_options
+}
+
+// 3. High Points Players (for backwards compatibility)
+CALL {
+    MATCH (ps:PlayerSeasonStats)
+    WHERE ps.total_points > 100
+      AND ($season IS NULL OR ps.season = $season)
+    WITH ps.player_name AS name,
+         sum(ps.total_points) AS total_points,
+         ps.season AS season
+    ORDER BY total_points DESC
+    LIMIT 5
+    RETURN collect({name: name, total_points: total_points, season: season}) AS high_performers
+}
+
+RETURN value_picks, captaincy_options, high_performers
+"""
+
+# Same, with the form ranking as of $gameweek of $form_season. The predicate
+# is swapped in Python so the (season, season_latest, points_3) or
+# (season, GW_number) index serves it.
+RECOMMEND_AT_GAMEWEEK_QUERY = RECOMMEND_QUERY.replace(
+    "WHERE pf.season = $form_season AND pf.season_latest = true AND pf.points_3 IS NOT NULL",
+    "WHERE pf.season = $form_season AND pf.GW_number = $gameweek AND pf.points_3 IS NOT NULL",
+)
+
+
+@cached_result(driver)
+def cypher_recommend(season: str = None, position: str = None, player_name: str = None, gameweek: int = None):
     """
     Returns player recommendations based on multiple criteria
-    Updated with new queries using CONTAINS for flexible matching
+    Seasons and names are matched exactly (see entity_resolution.resolve_entities)
     """
-    results = {}
-    
+    # Form is ranked within one season: the asked one, else the latest
+    form_season = season or get_gazetteer(driver).latest_season
+    cypher = RECOMMEND_QUERY if gameweek is None else RECOMMEND_AT_GAMEWEEK_QUERY
     with driver.session() as session:
-        # 1. Value Picks (Points per 90min)
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (p)-[:PLAYS_AS]->(pos:Position)
-            WHERE ($position IS NULL OR toLower(pos.name) CONTAINS toLower($position))
-            WITH p, pos, sum(r.total_points) as pts, sum(r.minutes) as mins
-            WHERE mins > 500
-            RETURN p.player_name AS player, 
-                   pos.name AS position, 
-                   pts AS total_points, 
-                   (toFloat(pts)/mins * 90) as pts_per_90
-            ORDER BY pts_per_90 DESC
-            LIMIT 5
-        """, position=position)
-        results['value_picks'] = [r.data() for r in result]
-        
-        # 2. Form (Last 3 Games)
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)
-            WHERE ($player_name IS NULL OR toLower(p.player_name) CONTAINS toLower($player_name))
-            WITH p, r, gw ORDER BY gw.GW_number DESC
-            WITH p, collect(r.total_points)[0..3] as recent_points
-            RETURN p.player_name AS player, 
-                   reduce(s = 0, x IN recent_points | s + x) as form_score
-            ORDER BY form_score DESC
-            LIMIT 5
-        """, player_name=player_name)
-        results['captaincy_options'] = [r.data() for r in result]
-        
-        # 3. High Points Players (for backwards compatibility)
-        result = session.run("""
-            MATCH (p:Player)-[r:PLAYED_IN]->(f:Fixture)
-            MATCH (f)<-[:HAS_FIXTURE]-(gw:Gameweek)<-[:HAS_GW]-(s:Season)
-            WHERE r.total_points > 100
-              AND ($season IS NULL OR toLower(s.season_name) CONTAINS toLower($season))
-            RETURN p.player_name AS name,
-                   sum(r.total_points) AS total_points,
-                   s.season_name AS season
-            ORDER BY total_points DESC
-            LIMIT 5
-        """, season=season)
-        results['high_performers'] = [r.data() for r in result]
+        record = session.run(cypher, position=position, season=season,
+                             player_key=search_key(player_name),
+                             gameweek=gameweek, form_season=form_season).single()
     
-    return results
+    return record.data()
+
+
+# Node labels whose candidates answer_query can use for each intent; other
+# intents search every label
+INTENT_LABELS = {
+    "player_stats": ["Player"],
+    "team_analysis": ["Team"],
+    "fixture_query": ["Fixture"],
+}
 
 
 # Update the answer_query function to use the new multi-query structure
@@ -445,20 +854,21 @@ def answer_query(user_input: str, entities, intent, model_choice="mpnet"):
     # entities = extract_entities(user_input)
     # entities = extract_entities_with_llm(user_input)
 
+    # 3. Map the extracted strings to canonical graph values once
+    entities = resolve_entities(driver, entities)
     season = entities.get("season", [None])[0] if entities.get("season") else None
 
 
-    # 4. Retrieve top similar nodes
-    candidates = semantic_search(user_input, model_choice=model_choice, limit=5)
+    # 4. Retrieve top similar nodes, only among the labels the intent can use
+    candidates = semantic_search(user_input, model_choice=model_choice, limit=5,
+                                 labels=INTENT_LABELS.get(intent))
     
-    # 5. Include all cosine similarity scores
-    results_with_scores = []
+    # 5. Keep one candidate per node
+    unique_candidates = []
     seen_nodes = set()
     
     for candidate in candidates:
-        label = candidate["label"]
         node = candidate["node"]
-        score = candidate["similarity_score"]
         
         # Use elementId or unique property
         node_unique_id = node.get("player_name") or node.get("name") or node.get("fixture_number") or candidate["node_id"]
@@ -466,34 +876,54 @@ def answer_query(user_input: str, entities, intent, model_choice="mpnet"):
         if node_unique_id in seen_nodes:
             continue
         seen_nodes.add(node_unique_id)
+        unique_candidates.append(candidate)
+
+    # 6. Run the Cypher for all candidates at once: one UNWIND over the matched
+    #    players/teams/fixtures, and the candidate-independent rankings only once
+    position = entities.get("position", [None])[0] if entities.get("position") else None
+    batch_data = {}
+    shared_data = None
+    if intent == "player_stats":
+        batch_data = cypher_player_stats_batch(
+            [c["node"]["player_name"] for c in unique_candidates if c["label"] == "Player"], season)
+    elif intent == "team_analysis":
+        batch_data = cypher_team_analysis_batch(
+            [c["node"]["name"] for c in unique_candidates if c["label"] == "Team"], season)
+    elif intent == "fixture_query":
+        team = entities.get("team", [None])[0] if entities.get("team") else None
+        batch_data = cypher_fixture_info_batch(
+            [c["node"].get("fixture_number") for c in unique_candidates], season=season, team=team)
+    elif intent == "top_players" and unique_candidates:
+        shared_data = cypher_top_scorers(season=season, position=position)
+    elif intent == "recommendation" and unique_candidates:
+        gameweek = entities.get("gameweek", [None])[0] if entities.get("gameweek") else None
+        shared_data = cypher_recommend(season=season, position=position, gameweek=gameweek)
+
+    # 7. Include all cosine similarity scores
+    results_with_scores = []
+    
+    for candidate in unique_candidates:
+        label = candidate["label"]
+        node = candidate["node"]
+        score = candidate["similarity_score"]
         
-        # Run the relevant Cypher query for this node
         data = None
         if intent == "player_stats" and label == "Player":
-            data = cypher_player_stats(node["player_name"], season)
+            data = batch_data.get(node["player_name"])
         elif intent == "team_analysis" and label == "Team":
-            data = cypher_team_analysis(node["name"], season)
+            data = batch_data.get(node["name"])
         elif intent == "fixture_query":
-            # Extract additional params if needed
-            team = entities.get("team", [None])[0] if entities.get("team") else None
-            player_name = entities.get("player_name", [None])[0] if entities.get("player_name") else None
-            data = cypher_fixture_info(
-                fixture_number=node.get("fixture_number"),
-                season=season,
-                team=team,
-                player_name=player_name
-            )
-        elif intent == "top_players":
-            position = entities.get("position", [None])[0] if entities.get("position") else None
-            data = cypher_top_scorers(season=season, position=position)
-        elif intent == "recommendation":
-            position = entities.get("position", [None])[0] if entities.get("position") else None
-            data = cypher_recommend(season=season, position=position)
+            data = batch_data.get(node.get("fixture_number"))
+        elif intent in ("top_players", "recommendation"):
+            # Same rankings for every candidate: reported once, with the best score
+            if results_with_scores:
+                continue
+            data = shared_data
         else:
             # Fallback: return node properties without embeddings
             if node:
                 data = {k: v for k, v in dict(node).items() 
-                       if k not in ("embedding_minilm", "embedding_mpnet")}
+                       if v is not None and not k.startswith("embedding_")}
             else:
                 data = {}
         
@@ -522,4 +952,20 @@ def answer_query(user_input: str, entities, intent, model_choice="mpnet"):
                 "data": data
             })
     
-    return results_with_scores
\ No newline at end of file
+    return results_with_scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed every KG node with the configured models.")
+    parser.add_argument("--batch-size", type=int, default=512, help="nodes per encode call and write transaction")
+    parser.add_argument("--encode-batch-size", type=int, default=64, help="batch size inside the model")
+    parser.add_argument("--label", default=None, help="only embed nodes with this label")
+    parser.add_argument("--season", default=None, help="only embed nodes of this season, e.g. 2022-23")
+    parser.add_argument("--force", action="store_true", help="re-encode nodes whose text did not change")
+    parser.add_argument("--prune", action="store_true", help="remove vectors of models not in EMBEDDING_MODELS")
+    parser.add_argument("--workers", type=int, default=1, help="encode in this many processes (one model each)")
+    args = parser.parse_args()
+
+    create_all_node_embeddings(batch_size=args.batch_size, encode_batch_size=args.encode_batch_size,
+                               label=args.label, season=args.season, force=args.force, prune=args.prune,
+                               workers=args.workers)
@@ -0,0 +1,220 @@
+import re
+import threading
+import time
+
+from GraphRetrievalLayer.schema import search_key
+from GraphRetrievalLayer.result_cache import result_cache
+from InputPreprocessing.team_synonyms import TEAM_SYNONYMS
+
+
+#--------------------------------------------
+# Entity resolution against an in-memory gazetteer
+#--------------------------------------------
+# Extracted strings ("Kane", "man city", "2022") are mapped once, before any
+# retrieval query runs, to the canonical values stored on the nodes
+# (player_name / Team.name / Season.season_name). Queries can then bind exact
+# search_name / season values instead of CONTAINS-matching the raw text.
+# The gazetteer is loaded from the graph on first use and rebuilt whenever
+# the KG version changes (see schema.bump_kg_version).
+
+# Shortest text the substring tier of resolve_team accepts
+MIN_TEAM_FRAGMENT = 3
+
+GAZETTEER_PLAYERS = """
+MATCH (p:Player)
+RETURN p.player_name AS name,
+       p.player_element AS element,
+       coalesce(p.search_name, toLower(p.player_name)) AS key,
+       [(p)-[pf:PLAYS_FOR]->(t:Team) | [pf.season, t.name]] AS teams,
+       reduce(total = 0, pts IN [(p)-[:HAS_SEASON_STATS]->(ps:PlayerSeasonStats) | coalesce(ps.total_points, 0)]
+              | total + pts) AS total_points
+"""
+
+GAZETTEER_TEAMS = """
+MATCH (t:Team)
+RETURN t.name AS name, coalesce(t.search_name, toLower(t.name)) AS key
+"""
+
+GAZETTEER_SEASONS = """
+MATCH (s:Season)
+RETURN s.season_name AS name
+"""
+
+
+class Gazetteer:
+    """
+    Canonical players, teams and seasons of the graph, indexed by search key.
+    """
+
+    def __init__(self, players, teams, seasons):
+        self.players = players
+        self.player_keys = {}
+        self.player_tokens = {}
+        for i, player in enumerate(players):
+            self.player_keys.setdefault(player["key"], []).append(i)
+            for token in player["key"].split():
+                self.player_tokens.setdefault(token, set()).add(i)
+
+        self.team_keys = {team["key"]: team["name"] for team in teams}
+        # Aliases only count for teams that exist in this graph
+        self.team_aliases = {}
+        for canonical, aliases in TEAM_SYNONYMS.items():
+            name = self.team_keys.get(search_key(canonical))
+            if name is None:
+                continue
+            for alias in aliases:
+                self.team_aliases.setdefault(search_key(alias), name)
+
+        self.seasons = sorted(seasons)
+        self.latest_season = self.seasons[-1] if self.seasons else None
+
+    @classmethod
+    def load(cls, driver):
+        start = time.time()
+        with driver.session() as session:
+            players = [r.data() for r in session.run(GAZETTEER_PLAYERS)]
+            teams = [r.data() for r in session.run(GAZETTEER_TEAMS)]
+            seasons = [r["name"] for r in session.run(GAZETTEER_SEASONS)]
+        for player in players:
+            player["teams"] = {(season, team) for season, team in player["teams"]}
+        print(f"Loaded gazetteer ({len(players)} players, {len(teams)} teams, {len(seasons)} seasons) "
+              f"in {time.time() - start:.2f}s")
+        return cls(players, teams, seasons)
+
+    def resolve_team(self, text):
+        """
+        Canonical team names for `text`, best first.
+        Tiers: exact name or alias, the longest name or alias inside `text`
+        ("Manchester City FC"), then names and aliases containing `text`
+        ("man" -> Man City, Man Utd), as the old CONTAINS lookup matched.
+        """
+        key = search_key(text)
+        if not key:
+            return []
+        if key in self.team_keys:
+            return [self.team_keys[key]]
+        if key in self.team_aliases:
+            return [self.team_aliases[key]]
+
+        known = sorted(list(self.team_keys.items()) + list(self.team_aliases.items()),
+                       key=lambda item: len(item[0]), reverse=True)
+        for known_key, name in known:
+            if re.search(rf"\b{re.escape(known_key)}\b", key):
+                return [name]
+
+        # Very short fragments would match most teams
+        if len(key) < MIN_TEAM_FRAGMENT:
+            return []
+        matches = sorted({name for known_key, name in known if key in known_key})
+        # Names starting with the fragment come before names merely containing it
+        return sorted(matches, key=lambda name: not search_key(name).startswith(key))
+
+    def resolve_season(self, text):
+        """
+        Canonical season name for "2022-23", "2022/23", "22/23", "2022" or "22", or None.
+        """
+        value = str(text).replace("/", "-").strip()
+        if value in self.seasons:
+            return value
+
+        years = [int(y) for y in re.findall(r"\d{4}|\d{2}", value)]
+        if not years:
+            return None
+        year = str(years[0] if years[0] >= 100 else 2000 + years[0])
+        # A bare year names the season starting in it, else the one ending in it
+        for season in self.seasons:
+            if season.split("-")[0] == year:
+                return season
+        for season in self.seasons:
+            if season.split("-")[-1] in (year, year[2:]):
+                return season
+        return None
+
+    @staticmethod
+    def resolve_gameweek(text):
+        """
+        Gameweek number in "GW12", "gameweek 12" or 12, or None.
+        """
+        match = re.search(r"\d+", str(text))
+        return int(match.group()) if match else None
+
+    def resolve_player(self, text, teams=(), seasons=()):
+        """
+        Players whose name matches `text`, best first.
+        Tiers: exact key, all tokens of `text` in the name ("kane"), then substring.
+        Within a tier, players at one of `teams` (in one of `seasons`) come first,
+        then the ones with more total points.
+        """
+        key = search_key(text)
+        if not key:
+            return []
+
+        matches = self.player_keys.get(key)
+        if not matches:
+            token_sets = [self.player_tokens.get(token, set()) for token in key.split()]
+            matches = set.intersection(*token_sets) if token_sets else set()
+        if not matches:
+            matches = [i for i, player in enumerate(self.players) if key in player["key"]]
+
+        teams, seasons = set(teams), set(seasons)
+
+        def rank(i):
+            player = self.players[i]
+            at_team = any(team in teams and (not seasons or season in seasons)
+                          for season, team in player["teams"])
+            return (not at_team, -(player["total_points"] or 0), player["key"])
+
+        return [self.players[i] for i in sorted(matches, key=rank)]
+
+
+_gazetteers = {}
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer(driver):
+    """
+    Gazetteer for `driver`'s database at its current KG version.
+    """
+    version = result_cache.kg_version(driver)
+    with _gazetteer_lock:
+        cached = _gazetteers.get(id(driver))
+        if cached is None or cached[0] != version:
+            cached = (version, Gazetteer.load(driver))
+            _gazetteers[id(driver)] = cached
+        return cached[1]
+
+
+def resolve_entities(driver, entities):
+    """
+    Returns a copy of `entities` (see extract_entities) with player_name, team and
+    season replaced by canonical graph values, best match first, and gameweeks
+    as ints.
+    Teams and seasons are resolved first so they can disambiguate players, and
+    every player matching an ambiguous mention ("Kane") is kept in rank order.
+    Strings that match nothing are kept as given.
+    """
+    if entities.get("resolved"):
+        return entities
+
+    gazetteer = get_gazetteer(driver)
+    resolved = dict(entities)
+
+    def resolve_list(values, resolve):
+        out = []
+        for value in values or []:
+            found = resolve(value)
+            for item in (found if isinstance(found, list) else [found]):
+                item = item if item is not None else value
+                if item not in out:
+                    out.append(item)
+        return out
+
+    resolved["team"] = resolve_list(entities.get("team"), lambda team: gazetteer.resolve_team(team) or None)
+    resolved["season"] = resolve_list(entities.get("season"), gazetteer.resolve_season)
+    resolved["gameweek"] = resolve_list(entities.get("gameweek"), gazetteer.resolve_gameweek)
+    resolved["player_name"] = resolve_list(
+        entities.get("player_name"),
+        lambda name: [p["name"] for p in gazetteer.resolve_player(name, resolved["team"], resolved["season"])] or None,
+    )
+    resolved["resolved"] = True
+    return resolved
@@ -0,0 +1,138 @@
+import copy
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from GraphRetrievalLayer.schema import read_kg_version
+
+#--------------------------------------------
+# Versioned cache for retrieval results
+#--------------------------------------------
+# Entries are keyed by (query id, params, KG version). Ingest gives the KG a
+# new version (schema.bump_kg_version), so results computed against an older
+# graph are simply never looked up again and age out.
+# Tier 1: in-process LRU of RESULT_CACHE_SIZE entries, each valid for
+#         RESULT_CACHE_TTL seconds.
+# Tier 2 (optional): SQLite file at RESULT_CACHE_PATH shared by processes.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH")
+# How long a read of the KG version is trusted before asking the graph again
+KG_VERSION_CHECK_SECONDS = float(os.getenv("KG_VERSION_CHECK_SECONDS", "5"))
+
+result_cache_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of query results, with an optional SQLite tier.
+    """
+
+    def __init__(self, max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, path=RESULT_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.versions = {}
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.conn.commit()
+
+    def kg_version(self, driver):
+        """
+        KG version of `driver`'s database, re-read at most every KG_VERSION_CHECK_SECONDS.
+        """
+        checked_at, version = self.versions.get(id(driver), (0.0, None))
+        if time.time() - checked_at > KG_VERSION_CHECK_SECONDS:
+            version = read_kg_version(driver)
+            self.versions[id(driver)] = (time.time(), version)
+        return version
+
+    def get_or_run(self, driver, query_id, params, run):
+        """
+        Returns the cached result for (query_id, params) at the current KG
+        version, or calls `run()` and caches what it returns.
+        """
+        payload = json.dumps([query_id, params, self.kg_version(driver)], sort_keys=True, default=str)
+        key = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+        found, value = self._get(key)
+        if found:
+            return copy.deepcopy(value)
+
+        value = run()
+        self._put(key, value)
+        return copy.deepcopy(value)
+
+    def _get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    result_cache_stats["memory_hits"] += 1
+                    return True, value
+                del self.entries[key]
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT value, expires_at FROM results WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    result_cache_stats["disk_hits"] += 1
+                    return True, value
+
+            result_cache_stats["misses"] += 1
+            return False, None
+
+    def _put(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            self._remember(key, value, expires_at)
+            if self.conn is not None:
+                # Only values that survive JSON unchanged go to disk (not e.g.
+                # neo4j temporal values or dicts with int keys)
+                try:
+                    serialized = json.dumps(value)
+                except TypeError:
+                    return
+                if json.loads(serialized) != value:
+                    return
+                self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, serialized, expires_at))
+                self.conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+                self.conn.commit()
+
+    def _remember(self, key, value, expires_at):
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+result_cache = ResultCache()
+
+
+def cached_result(driver):
+    """
+    Decorator caching a retrieval helper's return value per call arguments.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            params = {"args": args, "kwargs": kwargs}
+            return result_cache.get_or_run(driver, func.__qualname__, params, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
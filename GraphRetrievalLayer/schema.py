@@ -0,0 +1,300 @@
+import os
+import sys
+import unicodedata
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURRENT_DIR)
+sys.path.append(PARENT_DIR)
+
+
+#--------------------------------------------
+# Constraints and indexes for the FPL graph
+#--------------------------------------------
+# Every statement uses IF NOT EXISTS, so the bootstrap can run before every ingest.
+# Uniqueness constraints are backed by range indexes, which serve the MERGEs in
+# Create_kg.py and the exact-match lookups in the retrieval layer.
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT season_name_unique IF NOT EXISTS "
+    "FOR (s:Season) REQUIRE s.season_name IS UNIQUE",
+
+    "CREATE CONSTRAINT team_name_unique IF NOT EXISTS "
+    "FOR (t:Team) REQUIRE t.name IS UNIQUE",
+
+    "CREATE CONSTRAINT position_name_unique IF NOT EXISTS "
+    "FOR (po:Position) REQUIRE po.name IS UNIQUE",
+
+    "CREATE CONSTRAINT gameweek_key_unique IF NOT EXISTS "
+    "FOR (gw:Gameweek) REQUIRE (gw.season, gw.GW_number) IS UNIQUE",
+
+    "CREATE CONSTRAINT fixture_key_unique IF NOT EXISTS "
+    "FOR (f:Fixture) REQUIRE (f.season, f.fixture_number) IS UNIQUE",
+
+    "CREATE CONSTRAINT player_key_unique IF NOT EXISTS "
+    "FOR (p:Player) REQUIRE (p.player_name, p.player_element) IS UNIQUE",
+
+    # Lookups by name alone ({player_name: $player_name}) cannot use the composite key
+    "CREATE INDEX player_name_index IF NOT EXISTS "
+    "FOR (p:Player) ON (p.player_name)",
+
+    "CREATE INDEX gameweek_number_index IF NOT EXISTS "
+    "FOR (gw:Gameweek) ON (gw.GW_number)",
+
+    "CREATE INDEX fixture_number_index IF NOT EXISTS "
+    "FOR (f:Fixture) ON (f.fixture_number)",
+
+    "CREATE CONSTRAINT player_season_stats_key_unique IF NOT EXISTS "
+    "FOR (ps:PlayerSeasonStats) REQUIRE (ps.player_name, ps.player_element, ps.season) IS UNIQUE",
+
+    "CREATE INDEX player_season_stats_season_index IF NOT EXISTS "
+    "FOR (ps:PlayerSeasonStats) ON (ps.season)",
+
+    "CREATE INDEX player_season_stats_points_index IF NOT EXISTS "
+    "FOR (ps:PlayerSeasonStats) ON (ps.total_points)",
+
+    "CREATE CONSTRAINT player_form_key_unique IF NOT EXISTS "
+    "FOR (pf:PlayerForm) REQUIRE (pf.player_name, pf.player_element, pf.season, pf.GW_number) IS UNIQUE",
+
+    # Form rankings filter on `season_latest` within one season and order by
+    # the window totals
+    "CREATE INDEX player_form_season_latest_points_3_index IF NOT EXISTS "
+    "FOR (pf:PlayerForm) ON (pf.season, pf.season_latest, pf.points_3)",
+
+    "CREATE INDEX player_form_season_latest_points_5_index IF NOT EXISTS "
+    "FOR (pf:PlayerForm) ON (pf.season, pf.season_latest, pf.points_5)",
+
+    "CREATE INDEX player_form_gameweek_index IF NOT EXISTS "
+    "FOR (pf:PlayerForm) ON (pf.GW_number)",
+
+    # Form as of one gameweek of one season (recommendations for a given GW)
+    "CREATE INDEX player_form_season_gameweek_index IF NOT EXISTS "
+    "FOR (pf:PlayerForm) ON (pf.season, pf.GW_number)",
+
+    # Text indexes answer CONTAINS / STARTS WITH / = on the normalized search keys
+    "CREATE TEXT INDEX player_search_name_index IF NOT EXISTS "
+    "FOR (p:Player) ON (p.search_name)",
+
+    "CREATE TEXT INDEX team_search_name_index IF NOT EXISTS "
+    "FOR (t:Team) ON (t.search_name)",
+]
+
+
+#--------------------------------------------
+# Vector indexes for semantic search
+#--------------------------------------------
+# Labels that get embeddings (see embedding.build_node_text) and the output
+# size of each embedding model.
+EMBEDDED_LABELS = ["Season", "Gameweek", "Fixture", "Team", "Position", "Player"]
+
+EMBEDDING_DIMENSIONS = {"minilm": 384, "mpnet": 768}
+
+# How vectors are stored on the nodes (written by embedding.py, restored by
+# Create_kg.py --mode restore):
+#   float64  plain list property, the default (what older graphs hold)
+#   float32  32-bit float array via db.create.setNodeVectorProperty; half the
+#            size and still served by the vector indexes and the full scan
+#   float16  packed little-endian bytes; a quarter of the size, but only the
+#            local ANN index (ann_index.py) can search it
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float64")
+
+
+def vector_index_name(label, model_choice):
+    return f"{label.lower()}_embedding_{model_choice}_index"
+
+
+SCHEMA_STATEMENTS += [
+    f"CREATE VECTOR INDEX {vector_index_name(label, model_choice)} IF NOT EXISTS "
+    f"FOR (n:{label}) ON (n.embedding_{model_choice}) "
+    f"OPTIONS {{indexConfig: {{`vector.dimensions`: {dimensions}, `vector.similarity_function`: 'cosine'}}}}"
+    for model_choice, dimensions in EMBEDDING_DIMENSIONS.items()
+    for label in EMBEDDED_LABELS
+]
+
+
+#--------------------------------------------
+# Normalized search keys
+#--------------------------------------------
+# Letters that NFKD does not decompose into base letter + accent
+_FOLD_EXTRA = str.maketrans({"ø": "o", "Ø": "o", "æ": "ae", "Æ": "ae", "ß": "ss",
+                             "đ": "d", "Đ": "d", "ł": "l", "Ł": "l", "ı": "i"})
+
+
+def search_key(text):
+    """
+    Lowercase, accent-folded, whitespace-collapsed form of a player or team name.
+    Ingest stores it as `search_name`; retrieval normalizes its parameters the same
+    way, so "Ødegaard" and "odegaard" meet on an index-backed lookup.
+    """
+    if text is None:
+        return None
+    folded = unicodedata.normalize("NFKD", str(text).translate(_FOLD_EXTRA))
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return " ".join(folded.lower().split())
+
+
+def backfill_search_keys(driver, batch_size=1000):
+    """
+    Sets `search_name` on Player and Team nodes loaded before search keys existed.
+    """
+    for label, name_property in [("Player", "player_name"), ("Team", "name")]:
+        with driver.session() as session:
+            missing = [
+                {"id": r["id"], "search_name": search_key(r["name"])}
+                for r in session.run(
+                    f"MATCH (n:{label}) WHERE n.search_name IS NULL "
+                    f"RETURN elementId(n) AS id, n.{name_property} AS name"
+                )
+            ]
+            for i in range(0, len(missing), batch_size):
+                session.run(
+                    "UNWIND $rows AS row MATCH (n) WHERE elementId(n) = row.id SET n.search_name = row.search_name",
+                    rows=missing[i:i + batch_size],
+                ).consume()
+        if missing:
+            print(f"Backfilled search_name on {len(missing)} {label} nodes")
+
+
+def bootstrap_schema(driver, timeout_seconds=300):
+    """
+    Creates the constraints and indexes (idempotent) and waits until they are online.
+    """
+    with driver.session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            session.run(statement).consume()
+        session.run("CALL db.awaitIndexes($timeout)", timeout=timeout_seconds).consume()
+    print(f"Schema ready ({len(SCHEMA_STATEMENTS)} constraints/indexes)")
+
+
+#--------------------------------------------
+# KG version marker
+#--------------------------------------------
+# Every ingest sets a fresh version on a single KGMeta node; cached retrieval
+# results are keyed by it (see result_cache.py), so they go stale on their own.
+# A random token rather than a counter, so restoring an older snapshot can
+# never bring back a version that is already cached.
+def bump_kg_version(driver):
+    """
+    Gives the KG a new version and returns it.
+    """
+    with driver.session() as session:
+        version = session.run(
+            "MERGE (m:KGMeta {key: 'kg'}) "
+            "SET m.version = randomUUID(), m.updated_at = toString(datetime()) "
+            "RETURN m.version AS version"
+        ).single()["version"]
+    print(f"KG version is now {version}")
+    return version
+
+
+def read_kg_version(driver):
+    with driver.session() as session:
+        record = session.run("MATCH (m:KGMeta {key: 'kg'}) RETURN m.version AS version").single()
+    return record["version"] if record else None
+
+
+#--------------------------------------------
+# Index usage report for the retrieval queries
+#--------------------------------------------
+# Parameter values used to EXPLAIN the retrieval queries. Every query ignores
+# the parameters it does not reference.
+SAMPLE_PARAMS = {
+    # GraphRetrieval.retrieve_kg_context
+    "player_name": "Mohamed Salah",
+    "player_key": "mohamed salah",
+    "team": "Arsenal",
+    "team_key": "arsenal",
+    "position": "MID",
+    "gameweek": 5,
+    "season": "2022-23",
+    "form_season": "2022-23",
+    # Batched embedding.cypher_* helpers
+    "players": [{"name": "Mohamed Salah", "key": "mohamed salah"}],
+    "teams": [{"name": "Arsenal", "key": "arsenal"}],
+    "fixtures": [1],
+    # Semantic search and the embedding job
+    "limit": 5,
+    "query_vec": [0.0] * EMBEDDING_DIMENSIONS["mpnet"],
+    "hits": [{"id": "4:00000000-0000-0000-0000-000000000000:0", "score": 1.0}],
+    "labels": EMBEDDED_LABELS,
+    "label": None,
+    "models": list(EMBEDDING_DIMENSIONS),
+}
+
+SCAN_OPERATORS = ("AllNodesScan", "NodeByLabelScan")
+
+
+def _plan_operators(plan):
+    """
+    Flattens an EXPLAIN plan into (operator, details) pairs.
+    """
+    operator = plan.get("operatorType", "").split("@")[0]
+    args = plan.get("args") or plan.get("arguments") or {}
+    operators = [(operator, args.get("Details", ""))]
+    for child in plan.get("children", []):
+        operators.extend(_plan_operators(child))
+    return operators
+
+
+def explain_index_usage(driver, cypher, params=None):
+    """
+    Returns (index operators, scan operators) from the EXPLAIN plan of `cypher`.
+    """
+    with driver.session() as session:
+        summary = session.run("EXPLAIN " + cypher, params or SAMPLE_PARAMS).consume()
+
+    operators = _plan_operators(summary.plan)
+    index_ops = [(op, details) for op, details in operators if "Index" in op]
+    scan_ops = [(op, details) for op, details in operators if op in SCAN_OPERATORS]
+    return index_ops, scan_ops
+
+
+def retrieval_queries():
+    """
+    Yields (name, cypher) for every query the retrieval layer runs.
+    """
+    from GraphRetrievalLayer.Baseline import GraphRetrieval
+    from GraphRetrievalLayer import embedding
+
+    retriever = GraphRetrieval()
+    for intent in ["player_stats", "top_players", "fixture_query", "team_analysis", "recommendation"]:
+        queries = retriever.build_queries(intent)
+        for i, cypher in enumerate(queries):
+            yield f"Baseline.{intent}_{i+1}", cypher
+        # Queries whose text changes when a gameweek is asked for
+        for i, cypher in enumerate(retriever.build_queries(intent, gameweek=1)):
+            if cypher != queries[i]:
+                yield f"Baseline.{intent}_{i+1}_gameweek", cypher
+
+    for name, value in vars(embedding).items():
+        if name.endswith("_QUERY") and isinstance(value, str):
+            yield f"embedding.{name}", value
+
+
+def report_index_usage(driver):
+    """
+    Prints which indexes each retrieval query hits and which still scan a label.
+    """
+    for name, cypher in retrieval_queries():
+        try:
+            index_ops, scan_ops = explain_index_usage(driver, cypher)
+        except Exception as e:
+            print(f"{name}\n  error: {e}")
+            continue
+
+        print(name)
+        for op, details in index_ops:
+            print(f"  index: {op}  {details}")
+        for op, details in scan_ops:
+            print(f"  scan:  {op}  {details}")
+        if not index_ops and not scan_ops:
+            print("  (no node lookup)")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from GraphRetrievalLayer.Baseline import driver
+
+    bootstrap_schema(driver)
+    backfill_search_keys(driver)
+    report_index_usage(driver)
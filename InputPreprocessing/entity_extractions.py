@@ -8,6 +8,8 @@ from neo4j import GraphDatabase
 import spacy
 import re
 
+from InputPreprocessing.team_synonyms import TEAM_SYNONYMS
+
 URI = os.getenv("URI")
 USERNAME = os.getenv("NeoName")
 PASSWORD = os.getenv("PASSWORD")
@@ -137,101 +139,6 @@ def extract_position(text):
     return found
 
 def extract_team(text):
-    TEAM_SYNONYMS = {
-        "crystal palace": [
-            "palace", "crystal", "crystal palace fc", "cpfc"
-        ],
-
-        "nott'm forest": [
-            "nottingham forest", "forest", "notts forest", "nottm forest", "nottingham"
-        ],
-
-        "aston villa": [
-            "villa", "aston villa fc", "avfc"
-        ],
-
-        "southampton": [
-            "saints", "southampton fc", "soton"
-        ],
-
-        "bournemouth": [
-            "afc bournemouth", "bournemouth fc", "cherries"
-        ],
-
-        "brentford": [
-            "brentford fc", "the bees"
-        ],
-
-        "liverpool": [
-            "liverpool fc", "lfc", "the reds"
-        ],
-
-        "leicester": [
-            "leicester city", "leicester city fc", "lcfc", "foxes", "leicester fc"
-        ],
-
-        "newcastle": [
-            "newcastle united", "newcastle utd", "newcastle united fc", "nufc", "magpies"
-        ],
-
-        "brighton": [
-            "brighton & hove albion", "brighton and hove albion", "bha", "bhafc", "brighton fc", "seagulls"
-        ],
-
-        "west ham": [
-            "west ham united", "west ham utd", "west ham united fc", "whu", "whufc", "hammers"
-        ],
-
-        "man city": [
-            "manchester city", "man city fc", "manchester city fc", "mancity", "mcfc", "city"
-        ],
-
-        "burnley": [
-            "burnley fc", "clarets"
-        ],
-
-        "norwich": [
-            "norwich city", "norwich city fc", "ncfc", "canaries"
-        ],
-
-        "chelsea": [
-            "chelsea fc", "cfc", "the blues"
-        ],
-
-        "everton": [
-            "everton fc", "efc", "toffees"
-        ],
-
-        "watford": [
-            "watford fc", "hornets"
-        ],
-
-        "man utd": [
-            "manchester united", "man united", "man utd fc", "manchester utd", "manchester united fc",
-            "mufc", "red devils"
-        ],
-
-        "arsenal": [
-            "arsenal fc", "afc", "gunners"
-        ],
-
-        "wolves": [
-            "wolverhampton wanderers", "wolverhampton", "wolves fc", "wwfc"
-        ],
-
-        "fulham": [
-            "fulham fc", "ffc", "cottagers"
-        ],
-
-        "spurs": [
-            "tottenham", "tottenham hotspur", "tottenham hotspur fc", "thfc"
-        ],
-
-        "leeds": [
-            "leeds united", "leeds utd", "leeds united fc", "lufc"
-        ]
-    }
-
     text_l = text.lower()
     found = []
 
@@ -1,18 +1,252 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 MODEL_MINILM = "sentence-transformers/all-MiniLM-L6-v2"
 MODEL_MPNET = "sentence-transformers/all-mpnet-base-v2"
 
-models = {
-    "minilm": SentenceTransformer(MODEL_MINILM),
-    "mpnet": SentenceTransformer(MODEL_MPNET)
+MODEL_NAMES = {
+    "minilm": MODEL_MINILM,
+    "mpnet": MODEL_MPNET
 }
 
+#--------------------------------------------
+# Inference backends
+#--------------------------------------------
+# "torch": the SentenceTransformer PyTorch models (default).
+# "onnx": int8 dynamically quantized ONNX exports served by onnxruntime
+#         (needs `pip install sentence-transformers[onnx]`). The export is
+#         written to ONNX_MODEL_DIR/<model_choice> on first use and reused.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+# Quantization target of the export: avx2, avx512, avx512_vnni or arm64
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+
+
+def onnx_model_path(model_choice: str):
+    return os.path.join(ONNX_MODEL_DIR, model_choice)
+
+
+def onnx_quantized_file():
+    return f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+
+def export_onnx_model(model_choice: str):
+    """
+    Exports `model_choice` to ONNX and writes its int8 dynamically quantized variant.
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    path = onnx_model_path(model_choice)
+    model = SentenceTransformer(MODEL_NAMES[model_choice], backend="onnx")
+    model.save_pretrained(path)
+    export_dynamic_quantized_onnx_model(model, quantization_config=ONNX_QUANTIZATION, model_name_or_path=path)
+    print(f"Exported quantized ONNX model for {model_choice} to {path}")
+
+
+def _load_model(model_choice: str, backend: str):
+    if backend == "onnx":
+        path = onnx_model_path(model_choice)
+        if not os.path.exists(os.path.join(path, onnx_quantized_file())):
+            export_onnx_model(model_choice)
+        return SentenceTransformer(path, backend="onnx", model_kwargs={"file_name": onnx_quantized_file()})
+    if backend == "torch":
+        return SentenceTransformer(MODEL_NAMES[model_choice])
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+# Shared registry: each model is loaded on first use and reused by
+# embed_user_query, semantic_search and the node embedding job.
+models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(model_choice: str, backend: str = None):
+    """
+    Returns the SentenceTransformer for `model_choice` on `backend`
+    (EMBEDDING_BACKEND by default), loading it once per process.
+    """
+    key = (backend or EMBEDDING_BACKEND, model_choice)
+    model = models.get(key)
+    if model is None:
+        with _models_lock:
+            model = models.get(key)
+            if model is None:
+                model = _load_model(model_choice, key[0])
+                models[key] = model
+    return model
+
+
+#--------------------------------------------
+# Query embedding cache
+#--------------------------------------------
+# Tier 1: in-process LRU of QUERY_CACHE_SIZE entries.
+# Tier 2 (optional): SQLite file at QUERY_CACHE_PATH, shared across runs and
+# processes, trimmed to QUERY_CACHE_DISK_SIZE least recently used entries.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH")
+QUERY_CACHE_DISK_SIZE = int(os.getenv("QUERY_CACHE_DISK_SIZE", "100000"))
+
+cache_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+
+def normalize_query(text: str):
+    return " ".join(str(text).lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache of query vectors keyed by (model_choice, normalized text).
+    """
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE, path=QUERY_CACHE_PATH, max_disk_size=QUERY_CACHE_DISK_SIZE):
+        self.max_size = max_size
+        self.max_disk_size = max_disk_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, query))"
+            )
+            self.conn.commit()
+
+    def get(self, model_choice, query):
+        key = (model_choice, query)
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                cache_stats["memory_hits"] += 1
+                return vector
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?", key
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE query_embeddings SET last_used = ? WHERE model = ? AND query = ?",
+                        (time.time(), *key),
+                    )
+                    self.conn.commit()
+                    vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._remember(key, vector)
+                    cache_stats["disk_hits"] += 1
+                    return vector
+
+            cache_stats["misses"] += 1
+            return None
+
+    def put(self, model_choice, query, vector):
+        key = (model_choice, query)
+        with self.lock:
+            self._remember(key, vector)
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                    (*key, np.asarray(vector, dtype=np.float32).tobytes(), time.time()),
+                )
+                self.conn.execute(
+                    "DELETE FROM query_embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM query_embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_size,),
+                )
+                self.conn.commit()
+
+    def _remember(self, key, vector):
+        self.entries[key] = vector
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+query_cache = QueryEmbeddingCache()
+
 
 def embed_user_query(text: str, model_choice: str = "minilm"):
     """
     Convert user text query into an embedding using the SELECTED model.
+    Repeated queries (same model, same text up to case and whitespace) are
+    served from the cache without running the model.
     """
-    model = models[model_choice]
-    vector = model.encode(text).tolist()
-    return vector
\ No newline at end of file
+    query = normalize_query(text)
+    # Vectors from different backends differ slightly, so they are cached apart
+    cache_model = model_choice if EMBEDDING_BACKEND == "torch" else f"{model_choice}-{EMBEDDING_BACKEND}"
+    vector = query_cache.get(cache_model, query)
+    if vector is None:
+        model = get_model(model_choice)
+        vector = model.encode(query).tolist()
+        query_cache.put(cache_model, query, vector)
+    return list(vector)
+
+
+#--------------------------------------------
+# Backend parity check
+#--------------------------------------------
+PARITY_QUERIES = [
+    "How many points did Salah score in 2022-23?",
+    "Who are the best defenders this season?",
+    "Arsenal fixtures next gameweek",
+    "Which midfielder should I captain?",
+]
+
+PARITY_DOCUMENTS = [
+    "Mohamed Salah plays as MID",
+    "Team Arsenal",
+    "Gameweek 5 of season 2022-23",
+    "Fixture 12 in season 2022-23 kickoff time 2022-08-13T14:00:00Z",
+    "Position DEF",
+    "Season 2021-22",
+]
+
+
+def _cosine_matrix(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return a @ b.T
+
+
+def check_backend_parity(model_choice: str, backend: str = "onnx", tolerance: float = 0.02):
+    """
+    Compares query-to-document cosine scores of `backend` against torch.
+    Returns (max absolute score difference, whether every query keeps its top document).
+    """
+    torch_model = get_model(model_choice, "torch")
+    other_model = get_model(model_choice, backend)
+
+    torch_scores = _cosine_matrix(torch_model.encode(PARITY_QUERIES), torch_model.encode(PARITY_DOCUMENTS))
+    other_scores = _cosine_matrix(other_model.encode(PARITY_QUERIES), other_model.encode(PARITY_DOCUMENTS))
+
+    max_diff = float(np.max(np.abs(torch_scores - other_scores)))
+    same_top = bool(np.all(torch_scores.argmax(axis=1) == other_scores.argmax(axis=1)))
+    status = "OK" if max_diff <= tolerance and same_top else "MISMATCH"
+    print(f"[{model_choice}] {backend} vs torch: max cosine diff {max_diff:.4f}, "
+          f"same top document: {same_top} -> {status}")
+    return max_diff, same_top
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the ONNX backend and check it against torch.")
+    parser.add_argument("--model", choices=list(MODEL_NAMES), action="append",
+                        help="model to export/check (repeatable); defaults to all")
+    parser.add_argument("--export", action="store_true", help="(re)export the quantized ONNX models")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="max allowed cosine score difference")
+    args = parser.parse_args()
+
+    failed = False
+    for model_choice in args.model or MODEL_NAMES:
+        if args.export:
+            export_onnx_model(model_choice)
+        max_diff, same_top = check_backend_parity(model_choice, "onnx", args.tolerance)
+        failed |= max_diff > args.tolerance or not same_top
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,99 @@
+#--------------------------------------------
+# Team aliases
+#--------------------------------------------
+# Canonical (lowercased graph) team name -> other ways users refer to it.
+# Shared by the keyword extractor and the retrieval-side entity resolution.
+TEAM_SYNONYMS = {
+    "crystal palace": [
+        "palace", "crystal", "crystal palace fc", "cpfc"
+    ],
+
+    "nott'm forest": [
+        "nottingham forest", "forest", "notts forest", "nottm forest", "nottingham"
+    ],
+
+    "aston villa": [
+        "villa", "aston villa fc", "avfc"
+    ],
+
+    "southampton": [
+        "saints", "southampton fc", "soton"
+    ],
+
+    "bournemouth": [
+        "afc bournemouth", "bournemouth fc", "cherries"
+    ],
+
+    "brentford": [
+        "brentford fc", "the bees"
+    ],
+
+    "liverpool": [
+        "liverpool fc", "lfc", "the reds"
+    ],
+
+    "leicester": [
+        "leicester city", "leicester city fc", "lcfc", "foxes", "leicester fc"
+    ],
+
+    "newcastle": [
+        "newcastle united", "newcastle utd", "newcastle united fc", "nufc", "magpies"
+    ],
+
+    "brighton": [
+        "brighton & hove albion", "brighton and hove albion", "bha", "bhafc", "brighton fc", "seagulls"
+    ],
+
+    "west ham": [
+        "west ham united", "west ham utd", "west ham united fc", "whu", "whufc", "hammers"
+    ],
+
+    "man city": [
+        "manchester city", "man city fc", "manchester city fc", "mancity", "mcfc", "city"
+    ],
+
+    "burnley": [
+        "burnley fc", "clarets"
+    ],
+
+    "norwich": [
+        "norwich city", "norwich city fc", "ncfc", "canaries"
+    ],
+
+    "chelsea": [
+        "chelsea fc", "cfc", "the blues"
+    ],
+
+    "everton": [
+        "everton fc", "efc", "toffees"
+    ],
+
+    "watford": [
+        "watford fc", "hornets"
+    ],
+
+    "man utd": [
+        "manchester united", "man united", "man utd fc", "manchester utd", "manchester united fc",
+        "mufc", "red devils"
+    ],
+
+    "arsenal": [
+        "arsenal fc", "afc", "gunners"
+    ],
+
+    "wolves": [
+        "wolverhampton wanderers", "wolverhampton", "wolves fc", "wwfc"
+    ],
+
+    "fulham": [
+        "fulham fc", "ffc", "cottagers"
+    ],
+
+    "spurs": [
+        "tottenham", "tottenham hotspur", "tottenham hotspur fc", "thfc"
+    ],
+
+    "leeds": [
+        "leeds united", "leeds utd", "leeds united fc", "lufc"
+    ]
+}
@@ -0,0 +1,64 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# Tests import the packages the same way the app does, from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeRecord(dict):
+    def data(self):
+        return dict(self)
+
+
+class FakeResult(list):
+    def single(self):
+        return self[0] if self else None
+
+    def consume(self):
+        return None
+
+
+class FakeSession:
+    def __init__(self, handler):
+        self.handler = handler
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, params=None, **kwargs):
+        return FakeResult(FakeRecord(r) for r in self.handler(query, {**(params or {}), **kwargs}))
+
+    def execute_write(self, work):
+        # The session doubles as the transaction
+        return work(self)
+
+
+class FakeDriver:
+    """
+    Stand-in for a neo4j driver: `handler(query, params)` returns the records.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def session(self):
+        return FakeSession(self.handler)
+
+
+@pytest.fixture
+def create_kg(tmp_path, monkeypatch):
+    """
+    Imports Create_kg.py from a directory holding a config.txt (read on import).
+    """
+    # Create_kg connects through the neo4j driver on import
+    pytest.importorskip("neo4j")
+    (tmp_path / "config.txt").write_text("URI=bolt://localhost:7687\nUSERNAME=neo4j\nPASSWORD=test\n")
+    monkeypatch.chdir(tmp_path)
+    sys.modules.pop("Create_kg", None)
+    return importlib.import_module("Create_kg")
@@ -0,0 +1,87 @@
+import numpy as np
+
+from GraphRetrievalLayer.ann_index import AnnIndex, export_ann_index
+from conftest import FakeDriver
+
+
+def build_index(tmp_path, vectors, labels):
+    records = [{"id": f"n{i}", "label": label, "vector": vector.tolist()}
+               for i, (vector, label) in enumerate(zip(vectors, labels))]
+    export_ann_index(FakeDriver(lambda query, params: records), "minilm", out_dir=str(tmp_path))
+    return AnnIndex("minilm", directory=str(tmp_path))
+
+
+def exact_top_k(vectors, labels, query, k, keep):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    rows = [i for i in np.argsort(-scores) if labels[i] in keep]
+    return [f"n{i}" for i in rows[:k]]
+
+
+def test_label_filter_returns_k_hits_of_rare_label(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(20000, 32)).astype(np.float32)
+    labels = ["Player"] * 20000
+    for i in rng.choice(20000, size=25, replace=False):
+        labels[i] = "Team"
+    index = build_index(tmp_path, vectors, labels)
+
+    for _ in range(10):
+        query = rng.normal(size=32).astype(np.float32)
+        hits = index.search(query, k=5, labels=["Team"])
+        assert [label for _, label, _ in hits] == ["Team"] * 5
+        assert [node_id for node_id, _, _ in hits] == exact_top_k(vectors, labels, query, 5, {"Team"})
+
+
+def test_unfiltered_search_finds_exact_match(tmp_path):
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+    index = build_index(tmp_path, vectors, ["Player"] * 2000)
+
+    hits = index.search(vectors[123], k=3)
+    assert hits[0][0] == "n123"
+    assert hits[0][2] > 0.999
+    assert [score for _, _, score in hits] == sorted((score for _, _, score in hits), reverse=True)
+
+
+def test_unknown_label_returns_nothing(tmp_path):
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(100, 8)).astype(np.float32)
+    index = build_index(tmp_path, vectors, ["Player"] * 100)
+
+    assert index.search(vectors[0], k=5, labels=["Team"]) == []
+
+
+def test_majority_label_filter_probes_lists(tmp_path, monkeypatch):
+    rng = np.random.default_rng(4)
+    vectors = rng.normal(size=(5000, 16)).astype(np.float32)
+    labels = ["Player" if i % 10 else "Fixture" for i in range(5000)]
+    index = build_index(tmp_path, vectors, labels)
+    monkeypatch.setattr("GraphRetrievalLayer.ann_index.ANN_EXACT_SCAN_ROWS", 100)
+
+    # No full copy of the label's rows: the exact-scan path is never taken
+    monkeypatch.setattr(index, "_top_k", wrap_top_k(index._top_k, max_rows=2500))
+    for row in [1, 42, 4999]:
+        hits = index.search(vectors[row], k=5, labels=["Player"])
+        assert hits[0][0] == f"n{row}"
+        assert [label for _, label, _ in hits] == ["Player"] * 5
+
+
+def test_probe_widens_until_k_label_hits(tmp_path, monkeypatch):
+    rng = np.random.default_rng(5)
+    vectors = rng.normal(size=(20000, 32)).astype(np.float32)
+    labels = ["Player"] * 20000
+    for i in rng.choice(20000, size=25, replace=False):
+        labels[i] = "Team"
+    index = build_index(tmp_path, vectors, labels)
+    monkeypatch.setattr("GraphRetrievalLayer.ann_index.ANN_EXACT_SCAN_ROWS", 0)
+
+    hits = index.search(rng.normal(size=32).astype(np.float32), k=5, n_probe=2, labels=["Team"])
+    assert [label for _, label, _ in hits] == ["Team"] * 5
+
+
+def wrap_top_k(top_k, max_rows):
+    def wrapped(rows, scores, k):
+        assert len(rows) <= max_rows
+        return top_k(rows, scores, k)
+    return wrapped
@@ -0,0 +1,116 @@
+import pytest
+
+from GraphRetrievalLayer import entity_resolution
+from GraphRetrievalLayer import result_cache as result_cache_module
+from GraphRetrievalLayer.entity_resolution import Gazetteer, get_gazetteer, resolve_entities
+from conftest import FakeDriver
+
+PLAYERS = [
+    {"name": "Harry Kane", "element": 1, "key": "harry kane",
+     "teams": [["2021-22", "Spurs"], ["2022-23", "Spurs"]], "total_points": 400},
+    {"name": "Kane Smith", "element": 2, "key": "kane smith",
+     "teams": [["2022-23", "Man City"]], "total_points": 10},
+    {"name": "Martin Ødegaard", "element": 3, "key": "martin odegaard",
+     "teams": [["2022-23", "Arsenal"]], "total_points": 200},
+    {"name": "Mohamed Salah", "element": 4, "key": "mohamed salah",
+     "teams": [["2022-23", "Liverpool"]], "total_points": 500},
+]
+TEAMS = [{"name": name, "key": name.lower()}
+         for name in ["Spurs", "Man City", "Man Utd", "Arsenal", "Liverpool", "Nott'm Forest"]]
+SEASONS = ["2022-23", "2021-22"]
+
+
+def graph_handler(version="v1"):
+    def handler(query, params):
+        if "KGMeta" in query:
+            return [{"version": version}]
+        if "MATCH (p:Player)" in query:
+            return [dict(p) for p in PLAYERS]
+        if "MATCH (t:Team)" in query:
+            return TEAMS
+        if "MATCH (s:Season)" in query:
+            return [{"name": s} for s in SEASONS]
+        raise AssertionError(query)
+    return handler
+
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer.load(FakeDriver(graph_handler()))
+
+
+def names(players):
+    return [p["name"] for p in players]
+
+
+def test_ambiguous_player_ranked_by_points(gazetteer):
+    assert names(gazetteer.resolve_player("Kane")) == ["Harry Kane", "Kane Smith"]
+
+
+def test_team_and_season_context_outrank_points(gazetteer):
+    assert names(gazetteer.resolve_player("kane", ["Man City"], ["2022-23"])) == ["Kane Smith", "Harry Kane"]
+    # Kane Smith was not at Man City in 2021-22
+    assert names(gazetteer.resolve_player("kane", ["Man City"], ["2021-22"])) == ["Harry Kane", "Kane Smith"]
+
+
+def test_exact_key_beats_token_match(gazetteer):
+    assert names(gazetteer.resolve_player("Harry  KANE")) == ["Harry Kane"]
+
+
+def test_accents_and_substrings(gazetteer):
+    assert names(gazetteer.resolve_player("odegaard")) == ["Martin Ødegaard"]
+    assert names(gazetteer.resolve_player("sala")) == ["Mohamed Salah"]
+    assert gazetteer.resolve_player("nobody") == []
+
+
+def test_team_names_and_aliases(gazetteer):
+    assert gazetteer.resolve_team("man city") == ["Man City"]
+    assert gazetteer.resolve_team("Manchester City") == ["Man City"]
+    assert gazetteer.resolve_team("tottenham hotspur") == ["Spurs"]
+    assert gazetteer.resolve_team("Nottingham Forest") == ["Nott'm Forest"]
+    assert gazetteer.resolve_team("real madrid") == []
+
+
+def test_partial_team_names(gazetteer):
+    assert gazetteer.resolve_team("liver") == ["Liverpool"]
+    assert gazetteer.resolve_team("nott") == ["Nott'm Forest"]
+    # Every team a fragment could mean is kept
+    assert gazetteer.resolve_team("man") == ["Man City", "Man Utd"]
+    assert gazetteer.resolve_team("ma") == []
+
+
+@pytest.mark.parametrize("text, season", [
+    ("2022-23", "2022-23"), ("2022/23", "2022-23"), ("22/23", "2022-23"),
+    ("2022", "2022-23"), (2021, "2021-22"), ("2023", "2022-23"), ("2019", None),
+])
+def test_seasons(gazetteer, text, season):
+    assert gazetteer.resolve_season(text) == season
+
+
+def test_resolve_entities(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "KG_VERSION_CHECK_SECONDS", 0)
+    monkeypatch.setattr(entity_resolution, "_gazetteers", {})
+    driver = FakeDriver(graph_handler())
+    entities = {"player_name": ["Kane", "Nobody"], "team": ["city"], "season": ["2022"],
+                "gameweek": ["GW12"], "position": ["FWD"]}
+
+    resolved = resolve_entities(driver, entities)
+    assert resolved["player_name"] == ["Kane Smith", "Harry Kane", "Nobody"]
+    assert resolved["team"] == ["Man City"]
+    assert resolved["season"] == ["2022-23"]
+    assert resolved["gameweek"] == [12]
+    assert resolved["position"] == ["FWD"]
+    assert entities["player_name"] == ["Kane", "Nobody"]
+    assert resolve_entities(driver, resolved) is resolved
+
+
+def test_gazetteer_reloads_on_new_kg_version(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "KG_VERSION_CHECK_SECONDS", 0)
+    monkeypatch.setattr(entity_resolution, "_gazetteers", {})
+    state = {"version": "v1"}
+    driver = FakeDriver(lambda query, params: graph_handler(state["version"])(query, params))
+
+    first = get_gazetteer(driver)
+    assert get_gazetteer(driver) is first
+    state["version"] = "v2"
+    assert get_gazetteer(driver) is not first
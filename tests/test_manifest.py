@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import FakeDriver
+
+
+ROW = {"season": "2022-23", "GW": 1, "fixture": 3, "element": 10, "name": "Harry Kane", "total_points": 8}
+
+
+def test_row_hash_ignores_int_float_and_nan_none(create_kg):
+    assert create_kg.row_hash(ROW) == create_kg.row_hash({**ROW, "GW": 1.0, "total_points": 8.0})
+    assert create_kg.row_hash({**ROW, "bonus": float("nan")}) == create_kg.row_hash({**ROW, "bonus": None})
+    assert create_kg.row_hash(ROW) != create_kg.row_hash({**ROW, "total_points": 9})
+
+
+def test_row_hash_ignores_derived_fields(create_kg):
+    derived = {**ROW, "name_key": "harry kane", "player_team": "Spurs", "player_team_key": "spurs"}
+    assert create_kg.row_hash(derived) == create_kg.row_hash(ROW)
+
+
+def test_manifest_diff(create_kg, tmp_path):
+    manifest = create_kg.Manifest(str(tmp_path / "manifest.sqlite"))
+    manifest.record([ROW])
+
+    changed = {**ROW, "total_points": 12}
+    new = {**ROW, "element": 11}
+    assert manifest.diff([ROW, changed, new]) == ([new], [changed])
+
+    manifest.record([changed, new])
+    assert manifest.diff([changed, new]) == ([], [])
+
+    manifest.reset()
+    assert manifest.diff([ROW]) == ([ROW], [])
+    manifest.close()
+
+
+def test_load_merge_records_only_written_batches(create_kg, tmp_path, monkeypatch):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_text(
+        "season,GW,fixture,element,name,home_team,away_team,was_home,team,total_points\n"
+        "2022-23,1,1,10,Harry Kane,Spurs,Arsenal,True,Spurs,8\n"
+        "2022-23,1,1,11,Bukayo Saka,Spurs,Arsenal,False,Arsenal,5\n"
+    )
+
+    def failing(query, params):
+        if params["rows"][0]["element"] == 11:
+            raise RuntimeError("write failed")
+        return []
+
+    monkeypatch.setattr(create_kg, "driver", FakeDriver(failing))
+    manifest = create_kg.Manifest(str(tmp_path / "manifest.sqlite"))
+    with pytest.raises(RuntimeError):
+        create_kg.load_merge(str(csv_path), batch_size=1, manifest=manifest)
+
+    rows = [row for batch in create_kg.iter_row_batches(str(csv_path), 10) for row in batch]
+    new_rows, _ = manifest.diff(rows)
+    assert [row["element"] for row in new_rows] == [11]
+    manifest.close()
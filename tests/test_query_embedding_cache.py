@@ -0,0 +1,35 @@
+import pytest
+
+# input_embedding imports sentence_transformers at module level
+pytest.importorskip("sentence_transformers")
+
+from InputPreprocessing.input_embedding import QueryEmbeddingCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  Who is   the TOP scorer? ") == "who is the top scorer?"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_size=2, path=None)
+    cache.put("minilm", "a", [1.0])
+    cache.put("minilm", "b", [2.0])
+    cache.get("minilm", "a")
+    cache.put("minilm", "c", [3.0])
+
+    assert cache.get("minilm", "a") == [1.0]
+    assert cache.get("minilm", "b") is None
+    assert cache.get("minilm", "c") == [3.0]
+
+
+def test_models_are_cached_apart():
+    cache = QueryEmbeddingCache(max_size=4, path=None)
+    cache.put("minilm", "q", [1.0])
+    assert cache.get("mpnet", "q") is None
+
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    path = str(tmp_path / "queries.sqlite")
+    QueryEmbeddingCache(max_size=4, path=path).put("minilm", "q", [0.5, 0.25])
+
+    assert QueryEmbeddingCache(max_size=4, path=path).get("minilm", "q") == [0.5, 0.25]
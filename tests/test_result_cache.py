@@ -0,0 +1,78 @@
+from GraphRetrievalLayer import result_cache as result_cache_module
+from GraphRetrievalLayer.result_cache import ResultCache
+from conftest import FakeDriver
+
+
+def version_driver(state):
+    def handler(query, params):
+        assert "KGMeta" in query
+        return [{"version": state["version"]}]
+    return FakeDriver(handler)
+
+
+def counting_run(calls, value):
+    def run():
+        calls.append(value)
+        return value
+    return run
+
+
+def test_hit_at_same_version(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "KG_VERSION_CHECK_SECONDS", 0)
+    driver = version_driver({"version": "v1"})
+    cache = ResultCache(max_size=8, ttl=60, path=None)
+    calls = []
+
+    assert cache.get_or_run(driver, "q", {"a": 1}, counting_run(calls, [1])) == [1]
+    assert cache.get_or_run(driver, "q", {"a": 1}, counting_run(calls, [2])) == [1]
+    assert calls == [[1]]
+
+
+def test_new_kg_version_invalidates(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "KG_VERSION_CHECK_SECONDS", 0)
+    state = {"version": "v1"}
+    driver = version_driver(state)
+    cache = ResultCache(max_size=8, ttl=60, path=None)
+    calls = []
+
+    cache.get_or_run(driver, "q", {"a": 1}, counting_run(calls, "old"))
+    state["version"] = "v2"
+    assert cache.get_or_run(driver, "q", {"a": 1}, counting_run(calls, "new")) == "new"
+    assert calls == ["old", "new"]
+
+
+def test_params_are_part_of_the_key(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "KG_VERSION_CHECK_SECONDS", 0)
+    driver = version_driver({"version": "v1"})
+    cache = ResultCache(max_size=8, ttl=60, path=None)
+
+    cache.get_or_run(driver, "q", {"a": 1}, lambda: "one")
+    assert cache.get_or_run(driver, "q", {"a": 2}, lambda: "two") == "two"
+
+
+def test_expired_entries_are_recomputed(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "KG_VERSION_CHECK_SECONDS", 0)
+    driver = version_driver({"version": "v1"})
+    cache = ResultCache(max_size=8, ttl=-1, path=None)
+
+    cache.get_or_run(driver, "q", {}, lambda: "first")
+    assert cache.get_or_run(driver, "q", {}, lambda: "second") == "second"
+
+
+def test_returned_values_are_copies(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "KG_VERSION_CHECK_SECONDS", 0)
+    driver = version_driver({"version": "v1"})
+    cache = ResultCache(max_size=8, ttl=60, path=None)
+
+    cache.get_or_run(driver, "q", {}, lambda: [{"player": "Salah"}]).append("mutated")
+    assert cache.get_or_run(driver, "q", {}, lambda: None) == [{"player": "Salah"}]
+
+
+def test_disk_tier_survives_a_new_process(monkeypatch, tmp_path):
+    monkeypatch.setattr(result_cache_module, "KG_VERSION_CHECK_SECONDS", 0)
+    driver = version_driver({"version": "v1"})
+    path = str(tmp_path / "results.sqlite")
+
+    ResultCache(max_size=8, ttl=60, path=path).get_or_run(driver, "q", {}, lambda: {"points": 10})
+    fresh = ResultCache(max_size=8, ttl=60, path=path)
+    assert fresh.get_or_run(driver, "q", {}, lambda: None) == {"points": 10}
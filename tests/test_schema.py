@@ -0,0 +1,30 @@
+import re
+
+import pytest
+
+from GraphRetrievalLayer.schema import search_key
+
+
+def test_search_key_folds_case_accents_and_whitespace():
+    assert search_key("  Martin   Ødegaard ") == "martin odegaard"
+    assert search_key("Raúl Jiménez") == "raul jimenez"
+    assert search_key("Nott'm Forest") == "nott'm forest"
+
+
+def test_search_key_of_none_is_none():
+    assert search_key(None) is None
+
+
+def test_search_key_is_idempotent():
+    assert search_key(search_key("Łukasz Fabiański")) == search_key("Łukasz Fabiański") == "lukasz fabianski"
+
+
+def test_sample_params_cover_every_retrieval_query():
+    # retrieval_queries imports the retrieval modules, which need the driver and models
+    pytest.importorskip("neo4j")
+    pytest.importorskip("sentence_transformers")
+    from GraphRetrievalLayer.schema import SAMPLE_PARAMS, retrieval_queries
+
+    for name, cypher in retrieval_queries():
+        missing = set(re.findall(r"\$(\w+)", cypher)) - set(SAMPLE_PARAMS)
+        assert not missing, f"{name} uses {missing}"
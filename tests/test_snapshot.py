@@ -0,0 +1,52 @@
+import json
+import os
+
+import pyarrow.parquet as pq
+
+from conftest import FakeDriver
+
+
+def write_snapshot(create_kg, snapshot_dir):
+    os.makedirs(snapshot_dir / "nodes")
+    os.makedirs(snapshot_dir / "relationships")
+    players = [
+        {"_id": "old-1", "player_name": "Harry Kane", "embedding_minilm": [0.5, 0.25]},
+        {"_id": "old-2", "player_name": "Mohamed Salah", "kickoff_time": float("nan")},
+    ]
+    teams = [{"_id": "old-3", "name": "Spurs"}]
+    plays_for = [{"_start": "old-1", "_end": "old-3", "season": "2022-23"}]
+    pq.write_table(create_kg._snapshot_table(players), snapshot_dir / "nodes" / "Player.parquet")
+    pq.write_table(create_kg._snapshot_table(teams), snapshot_dir / "nodes" / "Team.parquet")
+    pq.write_table(create_kg._snapshot_table(plays_for), snapshot_dir / "relationships" / "PLAYS_FOR.parquet")
+    with open(snapshot_dir / "snapshot.json", "w") as f:
+        json.dump({"nodes": {"Player": 2, "Team": 1}, "relationships": {"PLAYS_FOR": 1}}, f)
+
+
+def test_restore_formats_and_runs_every_query(create_kg, tmp_path, monkeypatch):
+    snapshot_dir = tmp_path / "snapshot"
+    write_snapshot(create_kg, snapshot_dir)
+
+    calls = []
+
+    def handler(query, params):
+        calls.append((query, params))
+        if "CREATE (n:" in query:
+            return [{"key": row["key"], "id": "new-" + row["key"][0]} for row in params["rows"]]
+        return []
+
+    monkeypatch.setattr(create_kg, "EMBEDDING_STORAGE", "float32")
+    monkeypatch.setattr(create_kg, "driver", FakeDriver(handler))
+    create_kg.restore_graph(str(snapshot_dir), str(tmp_path / "manifest.sqlite"), batch_size=10)
+
+    node_calls = [(q, p) for q, p in calls if "CREATE (n:" in q]
+    assert ["CREATE (n:`Player`)" in q for q, _ in node_calls] == [True, False]
+    player_rows = node_calls[0][1]["rows"]
+    # Vectors are set through setNodeVectorProperty, not as a plain property
+    assert "db.create.setNodeVectorProperty" in node_calls[0][0]
+    assert player_rows[0]["vectors"] == [{"property": "embedding_minilm", "values": [0.5, 0.25]}]
+    assert "embedding_minilm" not in player_rows[0]["props"]
+    # NaN was snapshotted as null and is not restored
+    assert player_rows[1]["props"] == {"player_name": "Mohamed Salah"}
+
+    rel_calls = [p for q, p in calls if "CREATE (a)-[r:`PLAYS_FOR`]->(b)" in q]
+    assert rel_calls[0]["rows"] == [{"start": "new-old-1", "end": "new-old-3", "props": {"season": "2022-23"}}]